@@ -0,0 +1,242 @@
+"""
+Batch mode for long URL lists
+Shards the input across several browser processes sharing one global rate limit,
+retries profiles whose shard failed and merges rows back in input order
+"""
+import multiprocessing as mp
+import queue
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import linkedin_scraper
+from utils import Deadline
+
+
+# Failure reasons worth a new browser: the server, the session or the browser may behave next time
+# (a new shard logs in again if the session hit a wall). no-main and the *-deadline reasons are final.
+RETRY_REASONS = ("load-timeout", "error-page", "login-wall", "shard-error")
+
+
+class RateLimiter:
+    """
+    Page-load rate limit shared by every process it is handed to. A parent limiter
+    (e.g. one for the whole worker) is honoured as well, so concurrent jobs share it.
+    """
+
+    def __init__(self, rate_per_min: float, ctx=None, parent: Optional["RateLimiter"] = None):
+        if rate_per_min <= 0:
+            raise ValueError("rate_per_min must be positive")
+        ctx = ctx or mp.get_context("spawn")
+        self.interval = 60.0 / rate_per_min
+        self.parent = parent
+        self._next = ctx.Value("d", 0.0, lock=False)
+        self._lock = ctx.Lock()
+
+    def acquire(self):
+        """Block until this process may start the next page load"""
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next.value)
+            self._next.value = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+        if self.parent:
+            self.parent.acquire()
+
+
+def split_shards(items: List[Tuple[int, str]], shards: int) -> List[List[Tuple[int, str]]]:
+    """Round-robin (index, url) pairs over at most `shards` non-empty shards"""
+    shards = max(1, min(shards, len(items)))
+    return [items[i::shards] for i in range(shards)]
+
+
+def merge_rows(urls: List[str], rows: Dict[int, Dict]) -> List[Dict]:
+    """Rows keyed by 1-based input index -> one row per input URL, in input order"""
+    return [rows.get(idx) or linkedin_scraper.empty_row(url) for idx, url in enumerate(urls, start=1)]
+
+
+def _login_cookies(email: str, password: str, headless: bool, proxy_url: Optional[str],
+                   job: Optional[Deadline] = None) -> Optional[List[Dict]]:
+    """Log in once (or reuse the stored session) and return the cookies every shard starts from"""
+    from utils import init_driver
+
+    driver = init_driver(headless=headless, proxy_url=proxy_url)
+    try:
+        if not linkedin_scraper.ensure_login(driver, email, password, job):
+            return None
+        return driver.get_cookies()
+    finally:
+        driver.quit()
+
+
+def _shard_main(shard_id: int, items, email: str, password: str, headless: bool,
+                proxy_url: Optional[str], limiter: RateLimiter, results, job_left: Optional[float] = None,
+                cookies: Optional[List[Dict]] = None):
+    """Entry point of a shard process: one driver on the shared session, its slice of URLs"""
+    from memory_governor import MemoryGovernor
+    from utils import init_driver, set_page_load_limiter
+
+    # Monotonic clocks are per process, so the job budget travels as seconds left
+    job = Deadline(job_left, name="job")
+    # Every page load in this shard (session restore, probes, profiles) is paced
+    set_page_load_limiter(limiter)
+    governor = None
+    try:
+        driver = init_driver(headless=headless, proxy_url=proxy_url)
+        governor = MemoryGovernor(
+            driver,
+            make_driver=lambda: init_driver(headless=headless, proxy_url=proxy_url),
+            restore_session=lambda d, cookies: linkedin_scraper.restore_session(d, cookies, email, password, job),
+            log=lambda msg: print(f"[SHARD {shard_id}] {msg}"),
+        )
+        if not linkedin_scraper.restore_session(driver, cookies or [], email, password, job):
+            results.put(("login-failed", shard_id, None, "login-failed", "Login failed"))
+            return
+        for n, (idx, url) in enumerate(items):
+            if job.expired():
+                # Everything left would fail instantly; report it without loading anything
+                for left_idx, left_url in items[n:]:
+                    results.put(("error", left_idx, None, "job-deadline", f"job-deadline: {left_url}"))
+                break
+            try:
+                row = linkedin_scraper.scrape_profile(
+                    governor.driver, url, idx, deadline=job.child(linkedin_scraper.profile_deadline_s())
+                )
+                results.put(("row", idx, row, "", ""))
+            except Exception as e:
+                # Anything but a classified page failure came from the browser itself
+                reason = getattr(e, "reason", "shard-error")
+                results.put(("error", idx, None, reason, str(e) if hasattr(e, "reason") else f"{reason}: {e}"))
+            if not job.expired():
+                governor.after_page()
+    except Exception as e:
+        # Driver crashed or never started; anything not reported gets retried
+        results.put(("shard-error", shard_id, None, "shard-error", str(e)))
+    finally:
+        if governor:
+            governor.quit()
+
+
+def _run_round(shard_items, email, password, headless, proxy_url, limiter, ctx,
+               on_result: Optional[Callable], job_left: Optional[float] = None,
+               cookies: Optional[List[Dict]] = None) -> Tuple[Dict[int, Dict], Dict[int, Tuple[str, str]], int]:
+    """Run one round of shard processes; returns (rows, {idx: (reason, error)}, login_failures)"""
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(
+            target=_shard_main,
+            args=(i, items, email, password, headless, proxy_url, limiter, results, job_left, cookies),
+            daemon=True,
+        )
+        for i, items in enumerate(shard_items)
+    ]
+    for p in procs:
+        p.start()
+
+    rows: Dict[int, Dict] = {}
+    errors: Dict[int, Tuple[str, str]] = {}
+    login_failures = 0
+
+    def handle(msg):
+        nonlocal login_failures
+        kind, key, row, reason, err = msg
+        if kind == "row":
+            rows[key] = row
+            errors.pop(key, None)
+            if on_result:
+                on_result(key, row, "")
+        elif kind == "error":
+            errors[key] = (reason, err)
+        elif kind == "login-failed":
+            login_failures += 1
+        else:
+            print(f"[BATCH] Shard {key} crashed: {err}")
+
+    # Drain while shards run; a child cannot exit until its queued rows are read
+    while any(p.is_alive() for p in procs):
+        try:
+            handle(results.get(timeout=1))
+        except queue.Empty:
+            continue
+    while True:
+        try:
+            handle(results.get(timeout=0.2))
+        except queue.Empty:
+            break
+    for p in procs:
+        p.join()
+    return rows, errors, login_failures
+
+
+def run_batch(
+    urls: List[str],
+    email: str,
+    password: str,
+    shards: int = 2,
+    rate_per_min: float = 20.0,
+    retries: int = 2,
+    headless: bool = True,
+    proxy_url: Optional[str] = None,
+    on_result: Optional[Callable[[int, Dict, str], None]] = None,
+    job_deadline_s: Optional[float] = None,
+    shared_limiter: Optional[RateLimiter] = None,
+) -> Optional[List[Dict]]:
+    """
+    Scrape urls across `shards` browser processes and return rows in input order.
+    Profiles whose shard dies or that hit a transient failure (RETRY_REASONS) are retried
+    up to `retries` more times; other failures are final. Rows still missing after that
+    are empty placeholders. Logs in once and hands the
+    cookies to every shard; returns None when that login (or every shard of the first
+    round restoring it) fails.
+    on_result(idx, row, error) is called in this process as each profile settles.
+    job_deadline_s bounds the whole batch, retry rounds included; each profile also
+    gets PROFILE_DEADLINE_S.
+    rate_per_min paces this batch's page loads across its shards; shared_limiter, if
+    given, is a limit shared with other jobs in this process and is honoured too.
+    """
+    if not urls:
+        return []
+
+    job = Deadline(job_deadline_s, name="job")
+    ctx = mp.get_context("spawn")
+    limiter = RateLimiter(rate_per_min, ctx=ctx, parent=shared_limiter)
+
+    # One login for the whole batch; shards and retry rounds start from its cookies
+    cookies = _login_cookies(email, password, headless, proxy_url, job)
+    if cookies is None:
+        return None
+
+    merged: Dict[int, Dict] = {}
+    last_errors: Dict[int, Tuple[str, str]] = {}
+    # Indexes are 1-based like the CSV rows and image names
+    todo = list(enumerate(urls, start=1))
+
+    for attempt in range(retries + 1):
+        if not todo or job.expired():
+            break
+        shard_items = split_shards(todo, shards)
+        n = len(shard_items)
+        print(f"[BATCH] Round {attempt + 1}: {len(todo)} URLs over {n} shard(s)")
+        rows, errors, login_failures = _run_round(
+            shard_items, email, password, headless, proxy_url, limiter, ctx, on_result,
+            job_left=max(job.remaining(), 0.001) if job.expires_at is not None else None,
+            cookies=cookies,
+        )
+        if attempt == 0 and login_failures == n and not rows:
+            return None
+        merged.update(rows)
+        last_errors.update(errors)
+        todo = [
+            (idx, url) for idx, url in todo
+            if idx not in merged and last_errors.get(idx, ("shard-error", ""))[0] in RETRY_REASONS
+        ]
+
+    for idx, url in enumerate(urls, start=1):
+        if idx in merged:
+            continue
+        _, err = last_errors.get(idx, ("shard-error", "shard-error: shard did not return a result"))
+        if on_result:
+            on_result(idx, None, err)
+        print(f"[BATCH] Giving up on {url}: {err}")
+
+    return merge_rows(urls, merged)
@@ -0,0 +1,281 @@
+"""
+End-to-end throughput benchmark against the local fixture site
+Drives the real scraper path (headless Chrome, login, linkedin_scraper.main / worker / batch)
+and reports profiles/min, per-stage time and Chrome RSS. Never touches linkedin.com.
+
+Examples:
+    python bench.py --profiles 10
+    python bench.py --mode worker --profiles 10 --latency-ms 500
+    python bench.py --mode batch --profiles 40 --shards 4 --rate-per-min 600
+    python bench.py --mode blocking --profiles 10   # page load and bytes with/without resource blocking
+    python bench.py --mode parse --profiles 20      # offline full vs partial parse, no Chrome
+    python bench.py --mode batch --shards 3 --fault bench-profile-2=hang:1 --fault bench-profile-5=500
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from fixture_site import FixtureSite, parse_faults
+
+
+def chrome_rss(proc) -> int:
+    """RSS of every chromedriver/Chrome descendant of proc; shard interpreters are not counted"""
+    import psutil
+
+    total = 0
+    for child in proc.children(recursive=True):
+        try:
+            if "chrom" in child.name().lower():
+                total += child.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total
+
+
+class RssSampler:
+    """Samples the RSS of the Chrome processes started by this benchmark (chromedriver + Chrome)"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            import psutil
+            me = psutil.Process()
+        except ImportError:
+            return
+        while not self._stop.is_set():
+            self.samples.append(chrome_rss(me))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def isolate_outputs() -> Path:
+    """Send images, stored sessions and the session key to a temp dir instead of the source tree"""
+    from cryptography.fernet import Fernet
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-"))
+    # Env reaches modules imported later and spawned shards; attributes cover modules already loaded
+    os.environ.update({
+        "IMAGES_DIR": str(tmp / "images"),
+        "SESSIONS_DIR": str(tmp / "sessions"),
+        "SESSION_KEY": Fernet.generate_key().decode(),
+    })
+    for name in ("linkedin_scraper", "worker"):
+        if name in sys.modules:
+            sys.modules[name].IMAGES_DIR = tmp / "images"
+    if "session_store" in sys.modules:
+        sys.modules["session_store"].SESSIONS_DIR = tmp / "sessions"
+    return tmp
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {"mean": statistics.mean(values), "p50": statistics.median(values), "p95": p95}
+
+
+def run_cli(urls: List[str], args) -> Dict:
+    """linkedin_scraper path: main() end to end (governor, deadlines, CSV) on temp input/output files"""
+    import pandas as pd
+
+    import linkedin_scraper
+
+    tmp = Path(tempfile.mkdtemp())
+    linkedin_scraper.INPUT_PATH = tmp / "profiles_input.txt"
+    linkedin_scraper.CSV_PATH = tmp / "profiles.csv"
+    linkedin_scraper.INPUT_PATH.write_text("\n".join(urls) + "\n", encoding="utf-8")
+    os.environ.update({
+        "LINKEDIN_EMAIL": "bench@example.com",
+        "LINKEDIN_PASS": "bench",
+        "HEADLESS": "false" if args.headed else "true",
+        "SHARDS": "1",
+    })
+
+    stages: Dict[str, List[float]] = {}
+    linkedin_scraper.main(stages)
+    rows = pd.read_csv(linkedin_scraper.CSV_PATH).fillna("").to_dict("records")
+    return {"rows": rows, "stages": stages}
+
+
+def run_worker(urls: List[str], site: FixtureSite, args) -> Dict:
+    """worker path: run_scrape_task end to end, webhooks and uploads go to the fixture sink"""
+    import worker
+
+    # The worker-wide page-load limit reads this on first use
+    os.environ["RATE_LIMIT_PER_MIN"] = str(args.rate_per_min)
+    worker.CSV_PATH = Path(tempfile.mkdtemp()) / "profiles.csv"
+    req = worker.ScrapeRequest(
+        jobId="bench",
+        email="bench@example.com",
+        password="bench",
+        urls=urls,
+        webhook=f"{site.base_url}/api/scrape-webhook",
+        shards=args.shards,
+        ratePerMin=args.rate_per_min,
+    )
+    task = worker.run_batch_task if args.shards > 1 else worker.run_scrape_task
+    asyncio.run(task(req))
+    events = [e for e in site.events if e.get("jobId") == "bench"]
+    import pandas as pd
+    rows = pd.read_csv(worker.CSV_PATH).fillna("").to_dict("records") if worker.CSV_PATH.exists() else []
+    # Time between consecutive progress events approximates per-profile latency
+    ticks = [e["_t"] for e in events if e.get("event") == "scraping"]
+    per_profile = [b - a for a, b in zip(ticks, ticks[1:])]
+    return {"rows": rows, "stages": {"profile": per_profile} if per_profile else {}}
+
+
+def run_batch(urls: List[str], args) -> Dict:
+    """batch path: run_batch across --shards browsers"""
+    import batch
+
+    rows = batch.run_batch(
+        urls, "bench@example.com", "bench",
+        shards=args.shards, rate_per_min=args.rate_per_min, retries=1, headless=not args.headed,
+    )
+    return {"rows": rows or [], "stages": {}}
+
+
+def run_blocking(urls: List[str], site: FixtureSite, args) -> Dict:
+    """cli path twice, without and with resource blocking; compares page-load time and bytes served"""
+    # Fresh login on both runs so login traffic is the same in each
+    os.environ["SESSION_REUSE"] = "false"
+    rows, stages = [], {}
+    for label, flag in (("off", "false"), ("on", "true")):
+        os.environ["BLOCK_RESOURCES"] = flag
+        before = site.bytes_sent
+        result = run_cli(urls, args)
+        served = site.bytes_sent - before
+        load = summarize(result["stages"].get("load", []))
+        print(f"[BENCH] blocking {label}: page load mean {load.get('mean', 0):.3f}s "
+              f"p95 {load.get('p95', 0):.3f}s, bytes served {served} ({served / len(urls) / 1024:.0f} KB/profile)")
+        rows.extend(result["rows"])
+        stages[f"load_{label}"] = result["stages"].get("load", [])
+    return {"rows": rows, "stages": stages}
+
+
+def run_parse(args) -> None:
+    """Offline: full vs partial parse of expanded fixture pages (no Chrome needed)"""
+    import tracemalloc
+
+    import linkedin_scraper
+    from fixture_site import fixture_profile, render_expanded_profile
+
+    pages = [
+        render_expanded_profile(fixture_profile(f"bench-profile-{i}"), "http://fixture", args.blob_kb)
+        for i in range(1, args.profiles + 1)
+    ]
+    results = {}
+    for label, partial in (("full", False), ("partial", True)):
+        times, peaks, fields = [], [], []
+        for page in pages:
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            soup = linkedin_scraper.parse_page(page, partial=partial)
+            fields.append(linkedin_scraper.extract_profile(soup))
+            times.append(time.perf_counter() - t0)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            soup.decompose()
+        results[label] = (times, peaks, fields)
+        print(f"{label:<8} parse+extract mean {statistics.mean(times) * 1000:.1f} ms, "
+              f"peak alloc mean {statistics.mean(peaks) / 2**20:.1f} MB")
+
+    same = results["full"][2] == results["partial"][2]
+    print(f"Rows identical: {same}")
+    if not same:
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scraper throughput benchmark against the fixture site")
+    parser.add_argument("--mode", choices=["cli", "worker", "batch", "blocking", "parse"], default="cli")
+    parser.add_argument("--profiles", type=int, default=10)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--rate-per-min", type=float, default=600.0)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--lazy-latency-ms", type=float, default=400.0)
+    parser.add_argument("--asset-latency-ms", type=float, default=50.0)
+    parser.add_argument("--blob-kb", type=int, default=200)
+    parser.add_argument("--fault", action="append", default=[], metavar="SLUG=MODE[:N]",
+                        help="Fixture profile that answers 500 or hangs (optionally only for its first N hits)")
+    parser.add_argument("--hang-s", type=float, default=120.0)
+    parser.add_argument("--headed", action="store_true", help="Show the browser instead of headless")
+    parser.add_argument("--json", dest="json_out", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    if args.mode == "parse":
+        return run_parse(args)
+
+    isolate_outputs()
+    with FixtureSite(latency_ms=args.latency_ms, lazy_latency_ms=args.lazy_latency_ms,
+                     asset_latency_ms=args.asset_latency_ms, jitter_ms=args.latency_ms * 0.1,
+                     blob_kb=args.blob_kb, faults=parse_faults(args.fault), hang_s=args.hang_s) as site:
+        os.environ["LINKEDIN_BASE_URL"] = site.base_url
+        urls = [site.profile_url(f"bench-profile-{i}") for i in range(1, args.profiles + 1)]
+
+        with RssSampler() as rss:
+            t0 = time.perf_counter()
+            if args.mode == "cli":
+                result = run_cli(urls, args)
+            elif args.mode == "worker":
+                result = run_worker(urls, site, args)
+            elif args.mode == "blocking":
+                result = run_blocking(urls, site, args)
+            else:
+                result = run_batch(urls, args)
+            elapsed = time.perf_counter() - t0
+        bytes_sent = site.bytes_sent
+        profile_hits = site.profile_hits
+
+    scraped = sum(1 for r in result["rows"] if r.get("name"))
+    report = {
+        "mode": args.mode,
+        "profiles": len(result["rows"]),
+        "scraped": scraped,
+        "elapsed_s": round(elapsed, 2),
+        "profiles_per_min": round(scraped / elapsed * 60, 2) if elapsed else 0.0,
+        "stages_s": {k: {m: round(v, 3) for m, v in summarize(vals).items()} for k, vals in result["stages"].items()},
+        "chrome_rss_mb": {
+            "peak": round(max(rss.samples, default=0) / 2**20, 1),
+            "last": round((rss.samples[-1] if rss.samples else 0) / 2**20, 1),
+        },
+        "bytes_served": bytes_sent,
+        "profile_pages_served": profile_hits,
+    }
+
+    print(f"Mode: {report['mode']}  profiles: {report['scraped']}/{report['profiles']}  elapsed: {report['elapsed_s']}s")
+    print(f"Throughput: {report['profiles_per_min']} profiles/min")
+    for stage, stats in report["stages_s"].items():
+        print(f"  {stage:<8} mean {stats['mean']:.3f}s  p50 {stats['p50']:.3f}s  p95 {stats['p95']:.3f}s")
+    print(f"Chrome RSS: peak {report['chrome_rss_mb']['peak']} MB, last {report['chrome_rss_mb']['last']} MB")
+    print(f"Bytes served by fixture site: {report['bytes_served']} ({report['profile_pages_served']} profile pages)")
+    if args.mode != "blocking":
+        in_order = [r.get("url") for r in result["rows"]] == urls
+        print(f"Rows in input order: {in_order}")
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+"""
+Local stand-in profile site for benchmarks and offline runs
+Serves LinkedIn-shaped pages (login form, feed, profiles with lazy-loaded sections
+and "see more" buttons) plus a webhook/upload sink for the worker, with configurable latency.
+
+Run standalone:
+    python fixture_site.py --port 8765 --latency-ms 300
+then point the scraper at it with LINKEDIN_BASE_URL=http://127.0.0.1:8765
+"""
+import argparse
+import html
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+FIRST_NAMES = ["Asha", "Rohan", "Meera", "Kabir", "Isha", "Arjun", "Nisha", "Vikram", "Priya", "Dev"]
+LAST_NAMES = ["Kulkarni", "Shah", "Iyer", "Mehta", "Rao", "Patil", "Nair", "Joshi", "Das", "Sen"]
+TITLES = ["Software Engineer", "Data Scientist", "Product Manager", "ML Engineer", "Backend Developer"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Labs", "Stark Industries", "Wayne Tech"]
+SCHOOLS = ["IIT Bombay", "Pune University", "NIT Trichy", "VJTI Mumbai", "BITS Pilani"]
+SKILLS = ["Python", "SQL", "Selenium", "React", "Docker", "AWS", "Pandas", "FastAPI", "Kubernetes", "Go"]
+CITIES = ["Pune, Maharashtra, India", "Mumbai, Maharashtra, India", "Bengaluru, Karnataka, India"]
+
+# 1x1 JPEG served as every avatar
+AVATAR_BYTES = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f"
+    "141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001000101"
+    "011100ffc4001f0000010501010101010100000000000000000102030405060708090a0bffc400b5100002010303020403"
+    "050504040000017d01020300041105122131410613516107227114328191a1082342b1c11552d1f02433627282090a1617"
+    "18191a25262728292a3435363738393a434445464748494a535455565758595a636465666768696a737475767778797a83"
+    "8485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2d3d4d5d6d7"
+    "d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100003f00fbfcffd9"
+)
+
+
+def fixture_profile(slug: str) -> Dict:
+    """Deterministic fake profile for a slug; the same slug always yields the same data"""
+    rng = random.Random(slug)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    title = rng.choice(TITLES)
+    return {
+        "slug": slug,
+        "name": name,
+        "headline": f"{title} at {rng.choice(COMPANIES)}",
+        "location": rng.choice(CITIES),
+        "about": " ".join(
+            f"{name.split()[0]} has worked on {rng.choice(SKILLS)} systems for {rng.randint(2, 12)} years."
+            for _ in range(6)
+        ),
+        "experiences": [
+            {
+                "title": rng.choice(TITLES),
+                "company": rng.choice(COMPANIES),
+                "date_range": f"{2014 + i} - {2016 + i}",
+                "description": f"Shipped {rng.choice(SKILLS)} projects for {rng.randint(3, 40)} teams.",
+            }
+            for i in range(rng.randint(2, 5))
+        ],
+        "education": [
+            {"school": rng.choice(SCHOOLS), "degree": "B.Tech, Computer Engineering", "year": "2010 - 2014"}
+            for _ in range(rng.randint(1, 2))
+        ],
+        "projects": [
+            {"title": f"Project {rng.choice(SKILLS)}", "description": "Internal tooling and automation."}
+            for _ in range(rng.randint(0, 3))
+        ],
+        "skills": rng.sample(SKILLS, rng.randint(4, len(SKILLS))),
+    }
+
+
+def _e(value: str) -> str:
+    return html.escape(value, quote=True)
+
+
+def _list_section(heading: str, items: List[str]) -> str:
+    return (
+        f'<section class="artdeco-card"><div class="pvs-header"><h2><span>{heading}</span></h2></div>'
+        f'<ul class="pvs-list">{"".join(items)}</ul></section>'
+    )
+
+
+def render_sections(profile: Dict) -> str:
+    """HTML fragment injected by the lazy loader once the visitor scrolls down"""
+    exp = [
+        f'<li class="pvs-list__item"><span class="mr1 t-bold">{_e(x["title"])}</span>'
+        f'<span class="t-14 t-normal">{_e(x["company"])}</span>'
+        f'<span class="t-14 t-normal t-black--light">{_e(x["date_range"])}</span>'
+        f'<div class="inline-show-more-text">{_e(x["description"])}</div></li>'
+        for x in profile["experiences"]
+    ]
+    edu = [
+        f'<li class="pvs-list__item"><span class="mr1 t-bold">{_e(x["school"])}</span>'
+        f'<span class="t-14 t-normal">{_e(x["degree"])}</span>'
+        f'<span class="t-14 t-normal t-black--light">{_e(x["year"])}</span></li>'
+        for x in profile["education"]
+    ]
+    proj = [
+        f'<li class="pvs-list__item"><span class="mr1 t-bold">{_e(x["title"])}</span>'
+        f'<span class="t-14 t-normal">{_e(x["description"])}</span></li>'
+        for x in profile["projects"]
+    ]
+    skills = [f'<li class="pvs-list__item"><span class="mr1 t-bold">{_e(s)}</span></li>' for s in profile["skills"]]
+    parts = [_list_section("Experience", exp), _list_section("Education", edu)]
+    if proj:
+        parts.append(_list_section("Projects", proj))
+    parts.append(_list_section("Skills", skills))
+    return "".join(parts)
+
+
+NAV_HTML = (
+    '<header class="global-nav"><a href="/feed/">Home</a><input placeholder="Search" type="text">'
+    '<nav>' + "".join(f'<a href="/nav/{i}">Nav item {i}</a>' for i in range(40)) + '</nav>'
+    '<img class="global-nav__me-photo" src="/media/me.jpg" alt="me"></header>'
+)
+
+MESSAGING_HTML = (
+    '<aside class="msg-overlay-list-bubble"><h2>Messaging</h2><ul>'
+    + "".join(f'<li class="msg-conversation-card">Conversation {i}: hello there, are you free this week?</li>' for i in range(60))
+    + "</ul></aside>"
+)
+
+PAGE_SCRIPT = """
+<script>
+(function () {
+  var about = document.querySelector('.pv-about-section .inline-show-more-text');
+  var more = document.querySelector('.pv-about-section button.see-more');
+  if (more) more.addEventListener('click', function () {
+    about.textContent = about.getAttribute('data-full');
+    more.remove();
+  });
+  var slot = document.getElementById('lazy-sections');
+  var io = new IntersectionObserver(function (entries) {
+    if (!entries.some(function (e) { return e.isIntersecting; })) return;
+    io.disconnect();
+    fetch(slot.getAttribute('data-src'), {credentials: 'same-origin'})
+      .then(function (r) { return r.text(); })
+      .then(function (h) { slot.innerHTML = h; });
+  });
+  io.observe(slot);
+})();
+</script>
+"""
+
+
+def render_profile(profile: Dict, base: str, blob_kb: int = 200) -> str:
+    """Full profile page: chrome, top card, about with see-more, lazy section slot, overlays and scripts"""
+    slug = profile["slug"]
+    avatar = f"{base}/media/{slug}.jpg"
+    about = profile["about"]
+    short_about = about[:80] + "…"
+    # Inline JSON like the real bootstrap payloads; dead weight for the parser
+    blob = json.dumps({"included": [{"urn": f"urn:li:fixture:{i}", "text": "x" * 64} for i in range(blob_kb * 12)]})
+    return f"""<!DOCTYPE html>
+<html lang="en"><head>
+<meta charset="utf-8">
+<title>{_e(profile['name'])} - {_e(profile['headline'])} | LinkedIn</title>
+<meta property="og:title" content="{_e(profile['name'])} - {_e(profile['headline'])} | LinkedIn">
+<meta property="og:image" content="{_e(avatar)}">
+<meta name="description" content="{_e(short_about)}">
+<link rel="stylesheet" href="/static/app.css">
+<link rel="preload" href="/static/fonts/inter.woff2" as="font" type="font/woff2" crossorigin>
+<style>@font-face {{ font-family: Inter; src: url(/static/fonts/inter.woff2) format("woff2"); }} body {{ font-family: Inter, sans-serif; }}</style>
+<script type="application/json" id="bootstrap-data">{blob}</script>
+</head><body>
+{NAV_HTML}
+<main class="scaffold-layout__main">
+  <section class="artdeco-card pv-top-card">
+    <img class="profile-background-image__image" src="/media/banner-{_e(slug)}.jpg" alt="">
+    <img class="pv-top-card-profile-picture__image" src="{_e(avatar)}" alt="{_e(profile['name'])}">
+    <div class="pv-text-details__left-panel">
+      <h1 class="text-heading-xlarge">{_e(profile['name'])}</h1>
+      <div class="text-body-medium break-words">{_e(profile['headline'])}</div>
+      <span class="text-body-small inline t-black--light">{_e(profile['location'])}</span>
+    </div>
+  </section>
+  <section class="artdeco-card pv-about-section">
+    <div><h2><span>About</span></h2></div>
+    <div class="inline-show-more-text" data-full="{_e(about)}">{_e(short_about)}</div>
+    <button class="see-more"><span>…see more</span></button>
+  </section>
+  <section class="artdeco-card activity-section" style="min-height:1600px"><h2>Activity</h2>
+    <video src="/media/intro-{_e(slug)}.mp4" preload="auto" muted></video>
+    {"".join(f'<img class="feed-shared-image" src="/media/post-{_e(slug)}-{i}.png" alt="">' for i in range(6))}
+  </section>
+  <div id="lazy-sections" data-src="/in/{_e(slug)}/sections"></div>
+</main>
+{MESSAGING_HTML}
+{PAGE_SCRIPT}
+<script src="/analytics/collect.js" async></script>
+</body></html>"""
+
+
+def render_expanded_profile(profile: Dict, base: str, blob_kb: int = 200) -> str:
+    """Profile page as the DOM looks after scrolling and clicking "see more" (for offline parse benchmarks)"""
+    page = render_profile(profile, base, blob_kb)
+    slot = f'<div id="lazy-sections" data-src="/in/{_e(profile["slug"])}/sections">'
+    page = page.replace(slot + "</div>", slot + render_sections(profile) + "</div>")
+    short_about = _e(profile["about"][:80] + "…")
+    return page.replace(f">{short_about}</div>", f">{_e(profile['about'])}</div>", 1)
+
+
+ASSET_SIZES = {
+    # extension -> (content type, approximate bytes), roughly what a profile page pulls in
+    ".css": ("text/css", 60_000),
+    ".js": ("application/javascript", 120_000),
+    ".woff2": ("font/woff2", 90_000),
+    ".mp4": ("video/mp4", 600_000),
+    ".png": ("image/png", 80_000),
+}
+
+
+def asset_body(path: str):
+    """(body, content type) for a static asset; avatars are real 1x1 JPEGs, the rest is padding"""
+    if path.endswith(".jpg"):
+        # Avatars stay tiny; banners carry a realistic payload after the JPEG end marker
+        padding = 150_000 if "/banner-" in path else 0
+        return AVATAR_BYTES + b"\0" * padding, "image/jpeg"
+    for ext, (ctype, size) in ASSET_SIZES.items():
+        if path.endswith(ext):
+            return b"/* fixture asset */" + b" " * size, ctype
+    return b"", "application/octet-stream"
+
+
+LOGIN_HTML = """<!DOCTYPE html>
+<html><head><title>LinkedIn Login</title></head><body>
+<main><form method="post" action="/checkpoint/lg/login-submit">
+<input id="username" name="session_key" type="text">
+<input id="password" name="session_password" type="password">
+<button type="submit">Sign in</button>
+</form></main></body></html>"""
+
+FEED_HTML = f"""<!DOCTYPE html>
+<html><head><title>Feed | LinkedIn</title></head><body>{NAV_HTML}<main><h1>Feed</h1></main></body></html>"""
+
+SESSION_COOKIE = "li_at"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    server_version = "FixtureSite/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _delay(self, ms: float):
+        if ms > 0:
+            jitter = self.server.jitter_ms
+            time.sleep(max(0.0, ms + random.uniform(-jitter, jitter)) / 1000.0)
+
+    def _send(self, status: int, body: bytes, ctype: str = "text/html; charset=utf-8", headers: Optional[Dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.stats_lock:
+            self.server.bytes_sent += len(body)
+
+    def _redirect(self, location: str, headers: Optional[Dict] = None):
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+
+    def _logged_in(self) -> bool:
+        return f"{SESSION_COOKIE}=" in (self.headers.get("Cookie") or "")
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        srv = self.server
+        if path == "/robots.txt":
+            return self._send(200, b"User-agent: *\nDisallow: /\n", "text/plain")
+        if path in ("/", "/login"):
+            self._delay(srv.latency_ms)
+            return self._send(200, LOGIN_HTML.encode())
+        if path.startswith("/feed"):
+            if not self._logged_in():
+                return self._redirect("/login")
+            self._delay(srv.latency_ms)
+            return self._send(200, FEED_HTML.encode())
+        if path.startswith("/in/"):
+            if not self._logged_in():
+                return self._redirect("/login")
+            parts = [p for p in path.split("/") if p]
+            slug = parts[1] if len(parts) > 1 else ""
+            profile = fixture_profile(slug)
+            if len(parts) > 2 and parts[2] == "sections":
+                self._delay(srv.lazy_latency_ms)
+                return self._send(200, render_sections(profile).encode())
+            fault = srv.take_fault(slug)
+            if fault == "500":
+                return self._send(500, b"<html><head><title>500 Internal Server Error</title></head><body><h1>Internal server error</h1></body></html>")
+            if fault == "hang":
+                # Never answer within the page-load timeout, then drop the connection
+                time.sleep(srv.hang_s)
+                return
+            self._delay(srv.latency_ms)
+            with srv.stats_lock:
+                srv.profile_hits += 1
+            return self._send(200, render_profile(profile, f"http://{self.headers.get('Host')}", srv.blob_kb).encode())
+        if path.startswith("/media/") or path.startswith("/static/") or path.startswith("/analytics/"):
+            self._delay(srv.asset_latency_ms)
+            return self._send(200, *asset_body(path))
+        self._send(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if path == "/checkpoint/lg/login-submit":
+            form = parse_qs(body.decode("utf-8", "replace"))
+            if not form.get("session_key") or not form.get("session_password"):
+                return self._redirect("/login")
+            self._delay(self.server.latency_ms)
+            return self._redirect("/feed/", {"Set-Cookie": f"{SESSION_COOKIE}=fixture-session; Path=/"})
+        if path == "/api/scrape-webhook":
+            try:
+                event = json.loads(body or b"{}")
+            except ValueError:
+                event = {}
+            event["_t"] = time.time()
+            with self.server.stats_lock:
+                self.server.events.append(event)
+            return self._send(200, b'{"ok":true}', "application/json")
+        if path.startswith("/api/upload/"):
+            return self._send(200, b'{"ok":true}', "application/json")
+        self._send(404, b"not found", "text/plain")
+
+
+FAULT_MODES = ("500", "hang")
+
+
+def parse_faults(specs: List[str]) -> Dict[str, List]:
+    """"slug=mode" or "slug=mode:N" (first N hits only) -> {slug: [mode, hits left or None]}"""
+    faults: Dict[str, List] = {}
+    for spec in specs:
+        slug, _, rest = spec.partition("=")
+        mode, _, times = rest.partition(":")
+        if not slug or mode not in FAULT_MODES:
+            raise ValueError(f"Bad fault spec {spec!r}; expected slug=500|hang[:N]")
+        faults[slug] = [mode, int(times) if times else None]
+    return faults
+
+
+class FixtureServer(ThreadingHTTPServer):
+    def take_fault(self, slug: str) -> Optional[str]:
+        """Fault to inject for this profile hit, if any; counted faults run out"""
+        with self.stats_lock:
+            fault = self.faults.get(slug)
+            if not fault or fault[1] == 0:
+                return None
+            if fault[1] is not None:
+                fault[1] -= 1
+            return fault[0]
+
+
+class FixtureSite:
+    """
+    Threaded fixture server; use as a context manager or call start()/stop().
+    faults ({slug: [mode, hits]} from parse_faults) makes chosen profiles answer 500 or hang.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                 lazy_latency_ms: float = 0.0, asset_latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 blob_kb: int = 200, verbose: bool = False, faults: Optional[Dict[str, List]] = None,
+                 hang_s: float = 120.0):
+        self.httpd = FixtureServer((host, port), FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency_ms = latency_ms
+        self.httpd.lazy_latency_ms = lazy_latency_ms
+        self.httpd.asset_latency_ms = asset_latency_ms
+        self.httpd.jitter_ms = jitter_ms
+        self.httpd.blob_kb = blob_kb
+        self.httpd.verbose = verbose
+        self.httpd.stats_lock = threading.Lock()
+        self.httpd.bytes_sent = 0
+        self.httpd.profile_hits = 0
+        self.httpd.events = []
+        self.httpd.faults = faults or {}
+        self.httpd.hang_s = hang_s
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def events(self) -> List[Dict]:
+        return self.httpd.events
+
+    @property
+    def bytes_sent(self) -> int:
+        return self.httpd.bytes_sent
+
+    @property
+    def profile_hits(self) -> int:
+        return self.httpd.profile_hits
+
+    def profile_url(self, slug: str) -> str:
+        return f"{self.base_url}/in/{slug}/"
+
+    def start(self) -> "FixtureSite":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in LinkedIn profile site")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Delay for login/feed/profile pages")
+    parser.add_argument("--lazy-latency-ms", type=float, default=400.0, help="Delay for lazy-loaded sections")
+    parser.add_argument("--asset-latency-ms", type=float, default=50.0, help="Delay for images/css/js")
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--blob-kb", type=int, default=200, help="Approximate size of the inline JSON blob")
+    parser.add_argument("--fault", action="append", default=[], metavar="SLUG=MODE[:N]",
+                        help="Make a profile answer 500 or hang (optionally only for its first N hits)")
+    parser.add_argument("--hang-s", type=float, default=120.0, help="How long a hanging profile stalls")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    site = FixtureSite(args.host, args.port, args.latency_ms, args.lazy_latency_ms,
+                       args.asset_latency_ms, args.jitter_ms, args.blob_kb, args.verbose,
+                       parse_faults(args.fault), args.hang_s)
+    print(f"Fixture site on {site.base_url} (profiles at {site.profile_url('<slug>')})")
+    try:
+        site.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,35 @@ import random
 import sys
 import time
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import quote, unquote, urlparse
 
 import pandas as pd
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from dotenv import load_dotenv
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 
-from utils import init_driver, human_scroll, wait_css, text_or_empty, json_dump_safe, download_image
+from utils import (
+    Deadline,
+    ScrapeFailure,
+    bounded_get,
+    init_driver,
+    human_scroll,
+    wait_css,
+    wait_any_css,
+    text_or_empty,
+    json_dump_safe,
+    download_image,
+    set_resource_blocking,
+)
 from lk_selectors import SELECTORS
+from memory_governor import MemoryGovernor
+import session_store
 
 
 ROOT = Path(__file__).resolve().parent
-IMAGES_DIR = ROOT / "images"
+IMAGES_DIR = Path(os.getenv("IMAGES_DIR") or ROOT / "images")
 CSV_PATH = ROOT / "profiles.csv"
 INPUT_PATH = ROOT / "profiles_input.txt"
 
@@ -42,10 +57,112 @@ def read_input_urls() -> List[str]:
     return urls
 
 
-def login(driver, email: str, password: str) -> bool:
-    driver.get("https://www.linkedin.com/login")
-    email_input = wait_css(driver, "input#username", timeout=15)
-    pass_input = wait_css(driver, "input#password", timeout=15)
+def base_url() -> str:
+    # LINKEDIN_BASE_URL points the scraper at a stand-in site (see fixture_site.py)
+    return os.getenv("LINKEDIN_BASE_URL", "https://www.linkedin.com").rstrip("/")
+
+
+def canonical_profile_url(url: str) -> Optional[str]:
+    # Normalize any linkedin.com/in/<slug> variant (www./country/mobile subdomain, casing,
+    # query, fragment, trailing path) to one fetchable URL; None for anything else
+    raw = (url or "").strip()
+    if not raw:
+        return None
+    if "://" not in raw:
+        raw = "https://" + raw
+    try:
+        parsed = urlparse(raw)
+    except ValueError:
+        return None
+    if parsed.scheme.lower() not in ("http", "https"):
+        return None
+    host = (parsed.hostname or "").lower()
+    base_host = (urlparse(base_url()).hostname or "").lower()
+    if host != base_host and host != "linkedin.com" and not host.endswith(".linkedin.com"):
+        return None
+    parts = [p for p in parsed.path.split("/") if p]
+    if len(parts) < 2 or parts[0].lower() != "in":
+        return None
+    slug = unquote(parts[1]).strip().lower()
+    if not slug:
+        return None
+    return f"{base_url()}/in/{quote(slug, safe='-_.~%')}/"
+
+
+def plan_urls(urls: List[str]) -> Tuple[List[str], List[Optional[int]]]:
+    # Returns (unique canonical URLs to fetch, and for every input position the index into
+    # that list, or None when the input is not a profile URL)
+    unique: List[str] = []
+    seen: Dict[str, int] = {}
+    mapping: List[Optional[int]] = []
+    for url in urls:
+        canon = canonical_profile_url(url)
+        if canon is None:
+            mapping.append(None)
+            continue
+        if canon not in seen:
+            seen[canon] = len(unique)
+            unique.append(canon)
+        mapping.append(seen[canon])
+    return unique, mapping
+
+
+def expand_rows(urls: List[str], rows: List[Dict], mapping: List[Optional[int]]) -> List[Dict]:
+    # One output row per original input position; duplicates share the scraped row
+    out: List[Dict] = []
+    for url, pos in zip(urls, mapping):
+        if pos is None or pos >= len(rows):
+            out.append(empty_row(url.strip()))
+        else:
+            out.append(dict(rows[pos], url=url.strip()))
+    return out
+
+
+LOGGED_IN_SELECTORS = ["input[placeholder='Search']", "img.global-nav__me-photo"]
+LOGGED_OUT_SELECTORS = ["input#username", "input#password"]
+LOGIN_ERROR_SELECTORS = ["#error-for-password", "#error-for-username"]
+# Profile readiness races content against an auth wall; list order breaks ties
+AUTH_WALL_SELECTORS = ["input#username", "form#join-form", ".authwall-join-form"]
+READY_SELECTORS = ["main", "h1.text-heading-xlarge", "section.top-card-layout"]
+AUTH_WALL_URL_PARTS = ("/login", "/authwall", "/checkpoint")
+# Server error pages and Chrome's own network error pages; worth another try, unlike a page without a profile
+ERROR_PAGE_MARKERS = (
+    "internal server error", "bad gateway", "service unavailable", "gateway timeout",
+    "http error 5", "this page isn't working", "this page isn’t working",
+    "this site can't be reached", "this site can’t be reached", "err_",
+)
+
+
+def on_auth_wall(driver) -> bool:
+    try:
+        path = urlparse(driver.current_url or "").path
+    except Exception:
+        return False
+    return any(path.startswith(part) for part in AUTH_WALL_URL_PARTS)
+
+
+def on_error_page(driver) -> bool:
+    try:
+        body = driver.find_element(By.TAG_NAME, "body").text[:2000]
+        text = f"{driver.title} {body}".lower()
+    except Exception:
+        return False
+    return any(marker in text for marker in ERROR_PAGE_MARKERS)
+
+
+def login(driver, email: str, password: str, deadline: Optional[Deadline] = None) -> bool:
+    # LOGIN_DEADLINE_S for the form, never past the caller's (job) deadline
+    seconds = float(os.getenv("LOGIN_DEADLINE_S", "40") or 0)
+    deadline = deadline.child(seconds, name="login") if deadline else Deadline(seconds, name="login")
+    # The login flow gets every asset; blocking only applies to profile pages
+    set_resource_blocking(driver, False)
+    try:
+        bounded_get(driver, f"{base_url()}/login", deadline)
+    except ScrapeFailure:
+        return False
+    email_input = wait_css(driver, "input#username", timeout=deadline.timeout(15))
+    # Same form as the username field, so no second long wait
+    pass_input = wait_css(driver, "input#password", timeout=deadline.timeout(3)) if email_input else None
     if not email_input or not pass_input:
         return False
     email_input.clear()
@@ -54,9 +171,68 @@ def login(driver, email: str, password: str) -> bool:
     pass_input.send_keys(password)
     pass_input.send_keys(Keys.ENTER)
 
-    # Basic post-login check
-    if wait_css(driver, "input[placeholder='Search']", timeout=15) or wait_css(driver, "img.global-nav__me-photo", timeout=15):
+    # Post-login check: first of signed-in nav or a login error wins
+    sel, _ = wait_any_css(driver, LOGGED_IN_SELECTORS + LOGIN_ERROR_SELECTORS, timeout=deadline.timeout(15))
+    return sel in LOGGED_IN_SELECTORS
+
+
+def restore_cookies(driver, cookies: List[Dict], deadline: Optional[Deadline] = None) -> bool:
+    if not cookies:
+        return False
+    try:
+        # Cookies can only be set for the domain currently loaded; robots.txt is the cheapest page there
+        bounded_get(driver, f"{base_url()}/robots.txt", deadline, cap=15)
+        for c in cookies:
+            try:
+                driver.add_cookie({k: v for k, v in c.items() if k in ("name", "value", "path", "domain", "secure", "httpOnly", "expiry")})
+            except Exception:
+                pass
         return True
+    except Exception:
+        return False
+
+
+def is_logged_in(driver, timeout: float = 8, deadline: Optional[Deadline] = None) -> bool:
+    # Fast probe: load the feed and take whichever shows up first, the signed-in nav or a login form
+    try:
+        bounded_get(driver, f"{base_url()}/feed/", deadline, cap=timeout + 15)
+    except Exception:
+        return False
+    if on_auth_wall(driver):
+        return False
+    if deadline:
+        timeout = deadline.timeout(timeout)
+    sel, _ = wait_any_css(driver, LOGGED_IN_SELECTORS + LOGGED_OUT_SELECTORS, timeout=timeout)
+    return sel in LOGGED_IN_SELECTORS
+
+
+def login_and_store(driver, email: str, password: str, deadline: Optional[Deadline] = None) -> bool:
+    if not login(driver, email, password, deadline):
+        return False
+    if session_store.session_reuse_enabled():
+        session_store.save_session(email, base_url(), password, driver.get_cookies())
+    return True
+
+
+def ensure_login(driver, email: str, password: str, deadline: Optional[Deadline] = None) -> bool:
+    # Reuse the stored session for this account when the probe accepts it; full login otherwise.
+    # deadline (the job budget) bounds every page load and wait on the way
+    if session_store.session_reuse_enabled():
+        cookies = session_store.load_session(email, base_url(), password)
+        if cookies and restore_cookies(driver, cookies, deadline) and is_logged_in(driver, deadline=deadline):
+            print("[SESSION] Reused stored session")
+            return True
+    return login_and_store(driver, email, password, deadline)
+
+
+def restore_session(
+    driver, cookies: List[Dict], email: str = "", password: str = "", deadline: Optional[Deadline] = None
+) -> bool:
+    # Carry cookies over to a fresh driver; fall back to a full login if they no longer work
+    if restore_cookies(driver, cookies, deadline) and is_logged_in(driver, deadline=deadline):
+        return True
+    if email and password:
+        return login_and_store(driver, email, password, deadline)
     return False
 
 
@@ -187,134 +363,270 @@ def parse_skills(soup: BeautifulSoup) -> List[str]:
     return uniq[:50]
 
 
-def main():
+CSV_HEADERS = [
+    "url",
+    "name",
+    "headline",
+    "location",
+    "about",
+    "image_file",
+    "experiences_json",
+    "education_json",
+    "projects_json",
+    "skills_csv",
+]
+
+# Everything the extractors read lives under <main>, plus <title> and a few <meta> tags
+PARTIAL_PARSE_TAGS = ["main", "title", "meta"]
+
+SEE_MORE_XPATH = "//button[.//span[contains(translate(text(),'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'see more')] or contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'see more')]"
+
+
+def empty_row(url: str) -> Dict:
+    # Placeholder row for failed profiles so output stays aligned with input
+    row = {h: "" for h in CSV_HEADERS}
+    row.update({"url": url, "experiences_json": "[]", "education_json": "[]", "projects_json": "[]"})
+    return row
+
+
+def expand_see_more(driver, deadline: Optional[Deadline] = None):
+    # Click a few visible see-more/show-all buttons if present
+    try:
+        buttons = driver.find_elements(By.XPATH, SEE_MORE_XPATH)
+        for b in buttons[:5]:
+            if deadline and deadline.remaining() < 0.3:
+                break
+            try:
+                driver.execute_script("arguments[0].click();", b)
+                time.sleep(0.3)
+            except Exception:
+                pass
+    except Exception:
+        pass
+
+
+def parse_page(html: str, partial: Optional[bool] = None) -> BeautifulSoup:
+    # Partial mode only builds the <main>, <title> and <meta> subtrees the extractors read,
+    # skipping navigation, messaging overlays, scripts and inline JSON blobs
+    if partial is None:
+        partial = os.getenv("PARTIAL_PARSE", "true").lower() != "false"
+    if partial:
+        soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer(PARTIAL_PARSE_TAGS))
+        if soup.find("main"):
+            return soup
+        # No <main> (auth wall, unusual layout): selectors may match elsewhere, parse everything
+        soup.decompose()
+    return BeautifulSoup(html, "html.parser")
+
+
+def extract_profile(soup: BeautifulSoup) -> Dict:
+    name = first_text(soup, SELECTORS["name"]) or ""
+    headline = first_text(soup, SELECTORS["headline"]) or ""
+    location = first_text(soup, SELECTORS["location"]) or ""
+    about = first_text(soup, SELECTORS["about"]) or ""
+    image_url = first_attr(soup, SELECTORS["image"], "src")
+
+    # Fallbacks (meta/title) if basic selectors miss
+    if not name:
+        # Try <title> e.g., "Jane Doe - Something | LinkedIn"
+        title_node = soup.select_one('title')
+        if title_node:
+            t = (title_node.get_text() or '').strip()
+            if t:
+                name = t.split(' - ')[0].split('|')[0].strip()
+    if not name:
+        og_title = meta_content(soup, 'og:title')
+        if og_title:
+            name = og_title.split(' - ')[0].split('|')[0].strip()
+
+    if not image_url:
+        image_url = meta_content(soup, 'og:image')
+
+    return {
+        "name": name,
+        "headline": headline,
+        "location": location,
+        "about": about,
+        "image_url": image_url,
+        "experiences": parse_experiences(soup),
+        "education": parse_education(soup),
+        "projects": parse_projects(soup),
+        "skills": parse_skills(soup),
+    }
+
+
+def profile_deadline_s() -> float:
+    return float(os.getenv("PROFILE_DEADLINE_S", "60") or 0)
+
+
+def scrape_profile(
+    driver,
+    url: str,
+    idx: int,
+    timings: Optional[Dict[str, float]] = None,
+    deadline: Optional[Deadline] = None,
+) -> Dict:
+    # timings, if given, receives seconds spent per stage (load/scroll/expand/parse/image)
+    # deadline (PROFILE_DEADLINE_S by default) caps every wait; overruns raise ScrapeFailure
+    timings = timings if timings is not None else {}
+    deadline = deadline or Deadline(profile_deadline_s())
+    set_resource_blocking(driver, os.getenv("BLOCK_RESOURCES", "true").lower() != "false")
+    t0 = time.perf_counter()
+    bounded_get(driver, url, deadline)
+    # initial wait for top section, raced against an auth wall
+    sel, _ = wait_any_css(driver, AUTH_WALL_SELECTORS + READY_SELECTORS, timeout=deadline.timeout(15))
+    if sel in AUTH_WALL_SELECTORS or on_auth_wall(driver):
+        raise ScrapeFailure("login-wall", driver.current_url)
+    if sel is None:
+        deadline.check("profile content")
+        raise ScrapeFailure("error-page" if on_error_page(driver) else "no-main", url)
+    t1 = time.perf_counter()
+    timings["load"] = t1 - t0
+    human_scroll(driver, steps=random.randint(6, 9), deadline=deadline)
+    t2 = time.perf_counter()
+    timings["scroll"] = t2 - t1
+
+    # Try to expand "See more" sections to reveal details
+    expand_see_more(driver, deadline)
+    t3 = time.perf_counter()
+    timings["expand"] = t3 - t2
+
+    html = driver.page_source
+    soup = parse_page(html)
+    fields = extract_profile(soup)
+
+    # Release the parse tree and page source now rather than on the next iteration
+    soup.decompose()
+    del soup, html
+
+    t4 = time.perf_counter()
+    timings["parse"] = t4 - t3
+
+    image_file = ""
+    if fields["image_url"]:
+        image_path = IMAGES_DIR / f"profile_{idx}.jpg"
+        # The image is optional; skip it rather than overrun the budget
+        if download_image(fields["image_url"], image_path, timeout=deadline.timeout(20)):
+            image_file = f"images/{image_path.name}"
+
+    timings["image"] = time.perf_counter() - t4
+
+    return {
+        "url": url,
+        "name": fields["name"],
+        "headline": fields["headline"],
+        "location": fields["location"],
+        "about": fields["about"],
+        "image_file": image_file,
+        "experiences_json": json_dump_safe(fields["experiences"]),
+        "education_json": json_dump_safe(fields["education"]),
+        "projects_json": json_dump_safe(fields["projects"]),
+        "skills_csv": ", ".join(fields["skills"][:50]),
+    }
+
+
+def save_csv(rows: List[Dict], path: Path = CSV_PATH):
+    # Save CSV with exact headers and UTF-8
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame(rows, columns=CSV_HEADERS)
+    df.to_csv(path, index=False, encoding="utf-8")
+
+
+def main(stages: Optional[Dict[str, List[float]]] = None):
+    # stages, if given, collects per-stage seconds for every profile (used by bench.py)
     load_env()
     email = os.getenv("LINKEDIN_EMAIL", "")
     password = os.getenv("LINKEDIN_PASS", "")
     headless = os.getenv("HEADLESS", "false").lower() == "true"
     proxy_url = os.getenv("PROXY_URL", "").strip() or None
+    shards = int(os.getenv("SHARDS", "1") or 1)
 
-    urls = read_input_urls()
+    input_urls = read_input_urls()
+    urls, mapping = plan_urls(input_urls)
     if not urls:
         print("No URLs in profiles_input.txt. Add linkedin.com/in/... URLs (one per line).")
         sys.exit(1)
+    skipped = sum(1 for pos in mapping if pos is None)
+    if skipped or len(urls) < len(input_urls):
+        print(f"{len(input_urls)} input URLs -> {len(urls)} unique profiles ({skipped} not profile URLs)")
+        for url, pos in zip(input_urls, mapping):
+            if pos is None:
+                print(f"Skipping non-profile URL: {url}")
+
+    if shards > 1:
+        # Batch mode: split the list across several browsers
+        import batch
+
+        rows = batch.run_batch(
+            urls,
+            email,
+            password,
+            shards=shards,
+            rate_per_min=float(os.getenv("RATE_LIMIT_PER_MIN", "20") or 20),
+            retries=int(os.getenv("SHARD_RETRIES", "2") or 2),
+            headless=headless,
+            proxy_url=proxy_url,
+            job_deadline_s=float(os.getenv("JOB_DEADLINE_S", "0") or 0),
+        )
+        if rows is None:
+            print("Login failed. Check credentials or disable headless mode.")
+            sys.exit(2)
+        save_csv(expand_rows(input_urls, rows, mapping), CSV_PATH)
+        print(f"Saved: {CSV_PATH}")
+        return
 
+    job = Deadline(float(os.getenv("JOB_DEADLINE_S", "0") or 0), name="job")
     driver = init_driver(headless=headless, proxy_url=proxy_url)
+    governor = MemoryGovernor(
+        driver,
+        make_driver=lambda: init_driver(headless=headless, proxy_url=proxy_url),
+        restore_session=lambda d, cookies: restore_session(d, cookies, email, password, job),
+    )
+    stages = stages if stages is not None else {}
     try:
-        if not login(driver, email, password):
-            print("Login failed. Check credentials or disable headless mode.")
+        t0 = time.perf_counter()
+        if not ensure_login(driver, email, password, job):
+            if job.expired():
+                print("Job deadline spent during login.")
+            else:
+                print("Login failed. Check credentials or disable headless mode.")
             sys.exit(2)
+        stages.setdefault("login", []).append(time.perf_counter() - t0)
 
         rows = []
         for idx, url in enumerate(urls, start=1):
+            if job.expired():
+                # Everything left would fail instantly; the rest stay empty rows
+                print(f"[{idx}/{len(urls)}] Failed [job-deadline]: stopping, {len(urls) - idx + 1} profiles not scraped")
+                break
+            timings: Dict[str, float] = {}
             try:
-                driver.get(url)
-                # initial wait for top section
-                wait_css(driver, "main", timeout=15)
-                human_scroll(driver, steps=random.randint(6, 9))
-
-                # Try to expand "See more" sections to reveal details
-                try:
-                    # Click a few visible see-more/show-all buttons if present
-                    buttons = driver.find_elements(By.XPATH, "//button[.//span[contains(translate(text(),'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'see more')] or contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'see more')]")
-                    for b in buttons[:5]:
-                        try:
-                            driver.execute_script("arguments[0].click();", b)
-                            time.sleep(0.3)
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
-
-                html = driver.page_source
-                soup = BeautifulSoup(html, "html.parser")
-
-                name = first_text(soup, SELECTORS["name"]) or ""
-                headline = first_text(soup, SELECTORS["headline"]) or ""
-                location = first_text(soup, SELECTORS["location"]) or ""
-                about = first_text(soup, SELECTORS["about"]) or ""
-                image_url = first_attr(soup, SELECTORS["image"], "src")
-
-                # Fallbacks (meta/title) if basic selectors miss
-                if not name:
-                    # Try <title> e.g., "Jane Doe - Something | LinkedIn"
-                    title_node = soup.select_one('title')
-                    if title_node:
-                        t = (title_node.get_text() or '').strip()
-                        if t:
-                            name = t.split(' - ')[0].split('|')[0].strip()
-                if not name:
-                    og_title = meta_content(soup, 'og:title')
-                    if og_title:
-                        name = og_title.split(' - ')[0].split('|')[0].strip()
-
-                if not image_url:
-                    image_url = meta_content(soup, 'og:image')
-
-                experiences = parse_experiences(soup)
-                education = parse_education(soup)
-                projects = parse_projects(soup)
-                skills = parse_skills(soup)
-
-                image_file = ""
-                if image_url:
-                    image_path = IMAGES_DIR / f"profile_{idx}.jpg"
-                    if download_image(image_url, image_path):
-                        image_file = f"images/{image_path.name}"
-
-                row = {
-                    "url": url,
-                    "name": name,
-                    "headline": headline,
-                    "location": location,
-                    "about": about,
-                    "image_file": image_file,
-                    "experiences_json": json_dump_safe(experiences),
-                    "education_json": json_dump_safe(education),
-                    "projects_json": json_dump_safe(projects),
-                    "skills_csv": ", ".join(skills[:50]),
-                }
-
+                row = scrape_profile(governor.driver, url, idx, timings, deadline=job.child(profile_deadline_s()))
                 rows.append(row)
-                printable_name = name or url
+                printable_name = row["name"] or url
                 print(f"[{idx}/{len(urls)}] Scraped: {printable_name}")
             except Exception as e:
-                print(f"[{idx}/{len(urls)}] Failed: {url} ({e})")
+                reason = getattr(e, "reason", "error")
+                print(f"[{idx}/{len(urls)}] Failed [{reason}]: {url} ({e})")
                 # Still append an empty row to preserve indexing
-                rows.append({
-                    "url": url,
-                    "name": "",
-                    "headline": "",
-                    "location": "",
-                    "about": "",
-                    "image_file": "",
-                    "experiences_json": "[]",
-                    "education_json": "[]",
-                    "projects_json": "[]",
-                    "skills_csv": "",
-                })
-
-        # Save CSV with exact headers and UTF-8
-        headers = [
-            "url",
-            "name",
-            "headline",
-            "location",
-            "about",
-            "image_file",
-            "experiences_json",
-            "education_json",
-            "projects_json",
-            "skills_csv",
-        ]
-        df = pd.DataFrame(rows, columns=headers)
-        df.to_csv(CSV_PATH, index=False, encoding="utf-8")
+                rows.append(empty_row(url))
+            for stage, secs in timings.items():
+                stages.setdefault(stage, []).append(secs)
+            if job.expired():
+                # No recycle for pages that will never load; the next iteration stops the job
+                continue
+            try:
+                governor.after_page()
+            except Exception as e:
+                # No usable browser left; keep what was scraped, the rest become empty rows
+                print(f"Stopping after {idx}/{len(urls)} profiles, driver recycle failed: {e}")
+                break
+
+        save_csv(expand_rows(input_urls, rows, mapping), CSV_PATH)
         print(f"Saved: {CSV_PATH}")
     finally:
-        driver.quit()
+        governor.quit()
 
 
 if __name__ == "__main__":
     main()
-
-
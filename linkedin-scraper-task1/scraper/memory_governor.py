@@ -0,0 +1,107 @@
+"""
+Chrome memory governor
+Samples the RSS of the driver's process tree after each page and swaps in a fresh
+driver (carrying the session over) once a memory or page-count threshold is hit
+"""
+import gc
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import process_tree_rss
+
+
+def driver_pid(driver) -> Optional[int]:
+    """PID of chromedriver; Chrome and its renderers are its descendants"""
+    try:
+        return driver.service.process.pid
+    except Exception:
+        return None
+
+
+def python_rss() -> int:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return 0
+
+
+class MemoryGovernor:
+    """
+    Owns the current driver for a long job. Call after_page() once per profile and
+    always use governor.driver, since it is replaced on recycle.
+
+    make_driver() -> new driver
+    restore_session(driver, cookies) -> bool, re-establishes the login on a fresh driver
+    """
+
+    def __init__(
+        self,
+        driver,
+        make_driver: Callable[[], Any],
+        restore_session: Callable[[Any, List[Dict]], bool],
+        max_rss_mb: Optional[float] = None,
+        max_pages: Optional[int] = None,
+        log: Callable[[str], None] = print,
+    ):
+        self.driver = driver
+        self.make_driver = make_driver
+        self.restore_session = restore_session
+        self.max_rss_mb = max_rss_mb if max_rss_mb is not None else float(os.getenv("MAX_DRIVER_RSS_MB", "1500") or 0)
+        self.max_pages = max_pages if max_pages is not None else int(os.getenv("MAX_PAGES_PER_DRIVER", "50") or 0)
+        self.log = log
+        self.pages = 0
+        self.recycles = 0
+
+    def sample(self) -> Dict:
+        # Not kept: the [MEMORY] log line is the record, so the governor itself stays flat
+        pid = driver_pid(self.driver)
+        return {
+            "t": time.time(),
+            "pages": self.pages,
+            "driver_rss_mb": round(process_tree_rss(pid) / 2**20, 1) if pid else 0.0,
+            "python_rss_mb": round(python_rss() / 2**20, 1),
+        }
+
+    def after_page(self):
+        """Record one page, log memory, and recycle the driver if a limit is exceeded"""
+        self.pages += 1
+        s = self.sample()
+        self.log(
+            f"[MEMORY] page {s['pages']} driver RSS {s['driver_rss_mb']} MB, python RSS {s['python_rss_mb']} MB"
+        )
+        if self.max_rss_mb and s["driver_rss_mb"] >= self.max_rss_mb:
+            self.recycle(f"driver RSS {s['driver_rss_mb']} MB >= {self.max_rss_mb:g} MB")
+        elif self.max_pages and self.pages >= self.max_pages:
+            self.recycle(f"{self.pages} pages >= {self.max_pages}")
+
+    def recycle(self, reason: str):
+        """Quit the current driver, start a new one and restore the session on it"""
+        try:
+            cookies = self.driver.get_cookies()
+        except Exception:
+            cookies = []
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        gc.collect()
+
+        t0 = time.perf_counter()
+        self.driver = self.make_driver()
+        self.pages = 0
+        self.recycles += 1
+        if not self.restore_session(self.driver, cookies):
+            raise RuntimeError("Could not restore session after driver recycle")
+        after = self.sample()
+        self.log(
+            f"[MEMORY] Recycled driver #{self.recycles} ({reason}); "
+            f"restored in {time.perf_counter() - t0:.1f}s, new driver RSS {after['driver_rss_mb']} MB"
+        )
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
@@ -0,0 +1,114 @@
+"""
+Encrypted per-account session store
+Keeps the browser cookies of a logged-in account on disk (Fernet-encrypted) so the
+next job can restore them instead of going through the login form again
+"""
+import hashlib
+import hmac
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from cryptography.fernet import Fernet, InvalidToken
+
+
+ROOT = Path(__file__).resolve().parent
+SESSIONS_DIR = Path(os.getenv("SESSIONS_DIR") or ROOT / "sessions")
+KEY_PATH = ROOT / ".session_key"
+
+
+def session_reuse_enabled() -> bool:
+    return os.getenv("SESSION_REUSE", "true").lower() != "false"
+
+
+def _read_key_file() -> bytes:
+    # O_EXCL makes exactly one process create the key, already owner-only; the rest read it
+    try:
+        fd = os.open(KEY_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+    except FileExistsError:
+        # Another process may have created it a moment ago and not written it yet
+        for _ in range(50):
+            key = KEY_PATH.read_bytes().strip()
+            if key:
+                return key
+            time.sleep(0.1)
+        raise ValueError(f"{KEY_PATH} is empty; delete it to generate a new session key")
+    key = Fernet.generate_key()
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def _fernet() -> Fernet:
+    # SESSION_KEY (a Fernet key) wins; otherwise a local key file is created once
+    key = os.getenv("SESSION_KEY", "").strip().encode() or _read_key_file()
+    try:
+        return Fernet(key)
+    except ValueError:
+        # A bad key is a configuration error, not a corrupt session: never delete sessions over it
+        source = "SESSION_KEY" if os.getenv("SESSION_KEY", "").strip() else str(KEY_PATH)
+        raise ValueError(f"{source} is not a valid Fernet key (32 url-safe base64-encoded bytes)") from None
+
+
+def session_path(email: str, base_url: str) -> Path:
+    # Hash the account so the email never appears in file names
+    digest = hashlib.sha256(f"{base_url}|{email.strip().lower()}".encode("utf-8")).hexdigest()[:24]
+    return SESSIONS_DIR / f"{digest}.session"
+
+
+def _password_verifier(password: str, salt: bytes) -> str:
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 200_000).hex()
+
+
+def save_session(email: str, base_url: str, password: str, cookies: List[Dict]) -> bool:
+    if not email or not password or not cookies:
+        return False
+    fernet = _fernet()
+    try:
+        SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
+        # The session only comes back for the password that created it (the worker serves many callers)
+        salt = os.urandom(16)
+        payload = {"salt": salt.hex(), "verifier": _password_verifier(password, salt), "cookies": cookies}
+        token = fernet.encrypt(json.dumps(payload).encode("utf-8"))
+        path = session_path(email, base_url)
+        # Owner-only from creation, and swapped in whole so a concurrent reader never sees half a token
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_CREAT | os.O_TRUNC | os.O_WRONLY, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(token)
+        os.replace(tmp, path)
+        return True
+    except Exception as e:
+        print(f"[SESSION] Could not save session: {e}")
+        return False
+
+
+def load_session(email: str, base_url: str, password: str) -> List[Dict]:
+    path = session_path(email, base_url)
+    if not email or not password or not path.exists():
+        return []
+    fernet = _fernet()
+    try:
+        payload = json.loads(fernet.decrypt(path.read_bytes()).decode("utf-8"))
+        verifier = _password_verifier(password, bytes.fromhex(payload["salt"]))
+        if not hmac.compare_digest(verifier, payload["verifier"]):
+            # Not this caller's session; leave it for the account owner
+            print("[SESSION] Stored session belongs to other credentials, not reusing it")
+            return []
+        return payload["cookies"]
+    except InvalidToken:
+        # Written under another key or corrupt: drop it, a fresh login will replace it
+        print("[SESSION] Discarding unreadable session file")
+        clear_session(email, base_url)
+        return []
+    except Exception:
+        return []
+
+
+def clear_session(email: str, base_url: str):
+    try:
+        session_path(email, base_url).unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,399 @@
+"""
+Offline checks for the pure helpers, the batch retry rounds, the session store,
+deadlines and the memory governor. No Chrome needed:
+    python -m pytest -q
+"""
+import multiprocessing as mp
+import os
+import stat
+import time
+from pathlib import Path
+
+import pytest
+from cryptography.fernet import Fernet
+
+import batch
+import linkedin_scraper
+import memory_governor
+import session_store
+import utils
+from utils import Deadline, DeadlineExceeded
+
+
+# ---------- URL planning ----------
+
+CANON = "https://www.linkedin.com/in/jane-doe/"
+
+
+@pytest.fixture(autouse=True)
+def linkedin_base(monkeypatch):
+    monkeypatch.setenv("LINKEDIN_BASE_URL", "https://www.linkedin.com")
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://www.linkedin.com/in/jane-doe", CANON),
+    ("https://www.linkedin.com/in/jane-doe/", CANON),
+    ("https://www.linkedin.com/in/jane-doe/?trk=public_profile&originalSubdomain=in", CANON),
+    ("https://www.linkedin.com/in/jane-doe#experience", CANON),
+    ("https://in.linkedin.com/in/jane-doe/", CANON),
+    ("http://m.linkedin.com/in/jane-doe", CANON),
+    ("https://WWW.LinkedIn.com/IN/Jane-Doe/details/experience/", CANON),
+    ("  linkedin.com/in/jane-doe  ", CANON),
+    ("https://www.linkedin.com/in/jane%20doe/", "https://www.linkedin.com/in/jane%20doe/"),
+    ("https://www.linkedin.com/company/acme/", None),
+    ("https://www.linkedin.com/in/", None),
+    ("https://www.linkedin.com/", None),
+    ("https://example.com/in/jane-doe/", None),
+    ("https://notlinkedin.com/in/jane-doe/", None),
+    ("ftp://linkedin.com/in/jane-doe", None),
+    ("javascript://linkedin.com/in/jane-doe", None),
+    ("", None),
+])
+def test_canonical_profile_url(url, expected):
+    assert linkedin_scraper.canonical_profile_url(url) == expected
+
+
+def test_plan_and_expand_rows():
+    inputs = [
+        "https://www.linkedin.com/in/a/",
+        "https://in.linkedin.com/in/A?trk=x",
+        "https://www.linkedin.com/company/acme/",
+        "https://www.linkedin.com/in/b",
+        "linkedin.com/in/a",
+    ]
+    unique, mapping = linkedin_scraper.plan_urls(inputs)
+    assert unique == ["https://www.linkedin.com/in/a/", "https://www.linkedin.com/in/b/"]
+    assert mapping == [0, 0, None, 1, 0]
+
+    rows = [dict(linkedin_scraper.empty_row(u), name=n) for u, n in zip(unique, ["A", "B"])]
+    expanded = linkedin_scraper.expand_rows(inputs, rows, mapping)
+    assert [r["name"] for r in expanded] == ["A", "A", "", "B", "A"]
+    assert [r["url"] for r in expanded] == inputs
+
+
+# ---------- batch ----------
+
+ITEMS = [(i, f"u{i}") for i in range(1, 8)]
+
+
+@pytest.mark.parametrize("shards, sizes", [(1, [7]), (3, [3, 2, 2]), (7, [1] * 7), (20, [1] * 7), (0, [7])])
+def test_split_shards(shards, sizes):
+    parts = batch.split_shards(ITEMS, shards)
+    assert [len(p) for p in parts] == sizes
+    assert sorted(sum(parts, [])) == ITEMS
+
+
+def test_merge_rows_keeps_input_order():
+    urls = [f"https://www.linkedin.com/in/p{i}/" for i in range(1, 5)]
+    merged = batch.merge_rows(urls, {3: {"url": urls[2], "name": "c"}, 1: {"url": urls[0], "name": "a"}})
+    assert [r["url"] for r in merged] == urls
+    assert [r["name"] for r in merged] == ["a", "", "c", ""]
+
+
+SHARD_COOKIES = [{"name": "li_at", "value": "test-session"}]
+
+
+class FakeDriver:
+    """Just enough of a WebDriver for the login and governor code paths"""
+
+    def __init__(self, pid=None):
+        self.quit_calls = 0
+        self.service = type("Service", (), {"process": type("Proc", (), {"pid": pid})()})()
+
+    def get_cookies(self):
+        return SHARD_COOKIES
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+def fake_shard(shard_id, items, email, password, headless, proxy_url, limiter, results, job_left=None, cookies=None):
+    """Browserless stand-in for batch._shard_main, driven by the URL slug: crash-* kills the
+    shard process on its first attempt, flaky-* times out once, error-* hits a 500 page once,
+    wall-* hits a login wall once, dead-* always has no main"""
+    marks = Path(os.environ["BATCH_TEST_MARKS"])
+    if cookies != SHARD_COOKIES:
+        results.put(("login-failed", shard_id, None, "login-failed", f"Shard got cookies {cookies!r}"))
+        return
+    for idx, url in items:
+        limiter.acquire()
+        slug = url.rstrip("/").rsplit("/", 1)[-1]
+        first = not (marks / slug).exists()
+        with open(marks / slug, "a") as f:
+            f.write("x")
+        if first and slug.startswith("crash-"):
+            os._exit(1)
+        transient = {"flaky-": "load-timeout", "error-": "error-page", "wall-": "login-wall"}
+        reason = next((r for prefix, r in transient.items() if slug.startswith(prefix)), None)
+        if first and reason:
+            results.put(("error", idx, None, reason, f"{reason}: {url}"))
+            continue
+        if slug.startswith("dead-"):
+            results.put(("error", idx, None, "no-main", f"no-main: {url}"))
+            continue
+        results.put(("row", idx, dict(linkedin_scraper.empty_row(url), name=slug), "", ""))
+
+
+def test_run_batch_retries_and_keeps_order(tmp_path, monkeypatch):
+    # Only the browser and the login form are stubbed; _login_cookies and the rounds run for real
+    monkeypatch.setattr(batch, "_shard_main", fake_shard)
+    monkeypatch.setattr(utils, "init_driver", lambda **kw: FakeDriver())
+    monkeypatch.setattr(linkedin_scraper, "ensure_login", lambda driver, email, password, deadline=None: True)
+    monkeypatch.setenv("BATCH_TEST_MARKS", str(tmp_path))
+
+    slugs = ["ok-1", "crash-2", "ok-3", "flaky-4", "error-5", "dead-6", "wall-7"]
+    urls = [f"https://www.linkedin.com/in/{slug}/" for slug in slugs]
+    settled = {}
+    rows = batch.run_batch(urls, "test@example.com", "test", shards=3, rate_per_min=6000, retries=2,
+                           on_result=lambda idx, row, err: settled.setdefault(idx, err))
+
+    assert [r["url"] for r in rows] == urls
+    assert [r["name"] for r in rows] == [s if not s.startswith("dead-") else "" for s in slugs]
+    assert (tmp_path / "dead-6").read_text() == "x"
+    assert settled[6].startswith("no-main")
+
+
+def test_run_batch_login_failure(monkeypatch):
+    monkeypatch.setattr(utils, "init_driver", lambda **kw: FakeDriver())
+    monkeypatch.setattr(linkedin_scraper, "ensure_login", lambda driver, email, password, deadline=None: False)
+    assert batch.run_batch(["https://www.linkedin.com/in/a/"], "test@example.com", "bad") is None
+
+
+def test_rate_limiter_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        batch.RateLimiter(0)
+
+
+def test_rate_limiter_honours_shared_parent():
+    shared = batch.RateLimiter(600)  # one page load per 0.1 s
+    jobs = [batch.RateLimiter(60000, parent=shared), batch.RateLimiter(60000, parent=shared)]
+    t0 = time.monotonic()
+    for _ in range(3):
+        for job in jobs:
+            job.acquire()
+    # Six loads from two jobs still keep the shared 0.1 s spacing
+    assert time.monotonic() - t0 >= 0.45
+
+
+def test_bounded_get_waits_for_page_load_limiter(monkeypatch):
+    acquired = []
+    monkeypatch.setattr(utils, "_page_load_limiter", type("L", (), {"acquire": lambda self: acquired.append(1)})())
+
+    class LoadDriver:
+        def set_page_load_timeout(self, seconds):
+            pass
+
+        def get(self, url):
+            pass
+
+    utils.bounded_get(LoadDriver(), "http://x/feed/")
+    assert acquired == [1]
+
+
+class PageDriver:
+    def __init__(self, title, body):
+        self.title, self._body = title, body
+
+    def find_element(self, by, value):
+        return type("Body", (), {"text": self._body})()
+
+
+@pytest.mark.parametrize("title, body, expected", [
+    ("500 Internal Server Error", "Internal server error", True),
+    ("", "This page isn’t working\nHTTP ERROR 502", True),
+    ("linkedin.com", "This site can’t be reached\nERR_CONNECTION_RESET", True),
+    ("Jane Doe | LinkedIn", "Profile unavailable", False),
+])
+def test_on_error_page(title, body, expected):
+    assert linkedin_scraper.on_error_page(PageDriver(title, body)) is expected
+
+
+# ---------- Deadline ----------
+
+def test_deadline_unlimited():
+    for seconds in (None, 0, -5):
+        d = Deadline(seconds)
+        assert d.remaining() == float("inf")
+        assert not d.expired()
+        assert d.timeout(7) == 7
+
+
+def test_deadline_child_capped_by_parent():
+    job = Deadline(1, name="job")
+    url = job.child(60)
+    assert url.remaining() <= 1
+    assert url.timeout(30) <= 1
+    assert job.child(None).remaining() <= 1
+
+
+def test_deadline_check_names_the_spent_budget():
+    job = Deadline(0.001, name="job")
+    url = job.child(60)
+    while not job.expired():
+        pass
+    assert url.expired()
+    assert url.timeout(5) == 0.0
+    with pytest.raises(DeadlineExceeded) as exc:
+        url.check("page load")
+    assert exc.value.reason == "job-deadline"
+
+
+def test_login_and_restore_respect_the_job_deadline():
+    class CountingDriver(FakeDriver):
+        gets = 0
+
+        def set_page_load_timeout(self, seconds):
+            pass
+
+        def get(self, url):
+            self.gets += 1
+
+    job = Deadline(0.001, name="job")
+    while not job.expired():
+        pass
+    driver = CountingDriver()
+    assert not linkedin_scraper.restore_session(driver, SHARD_COOKIES, "a@example.com", "pw", job)
+    assert driver.gets == 0
+
+
+def test_main_stops_at_job_deadline(tmp_path, monkeypatch):
+    urls = [f"https://www.linkedin.com/in/p{i}/" for i in range(1, 6)]
+    monkeypatch.setattr(linkedin_scraper, "INPUT_PATH", tmp_path / "in.txt")
+    monkeypatch.setattr(linkedin_scraper, "CSV_PATH", tmp_path / "out.csv")
+    linkedin_scraper.INPUT_PATH.write_text("\n".join(urls), encoding="utf-8")
+    for name, value in {"JOB_DEADLINE_S": "0.2", "SHARDS": "1", "LINKEDIN_EMAIL": "a@example.com",
+                        "LINKEDIN_PASS": "pw"}.items():
+        monkeypatch.setenv(name, value)
+
+    calls, pages = [], []
+
+    def scrape(driver, url, idx, timings=None, deadline=None):
+        calls.append(url)
+        while not deadline.expired():
+            pass
+        return dict(linkedin_scraper.empty_row(url), name=f"n{idx}")
+
+    monkeypatch.setattr(linkedin_scraper, "init_driver", lambda **kw: FakeDriver())
+    monkeypatch.setattr(linkedin_scraper, "ensure_login", lambda driver, email, password, deadline=None: True)
+    monkeypatch.setattr(linkedin_scraper, "scrape_profile", scrape)
+    monkeypatch.setattr(memory_governor.MemoryGovernor, "after_page", lambda self: pages.append(1))
+    linkedin_scraper.main()
+
+    # The first profile spends the job budget: nothing else is loaded and the browser is not recycled
+    assert calls == urls[:1] and pages == []
+    with open(linkedin_scraper.CSV_PATH, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 6 and ",n1," in lines[1] and ",n2," not in lines[2]
+
+
+# ---------- session store ----------
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, "KEY_PATH", tmp_path / ".session_key")
+    monkeypatch.setattr(session_store, "SESSIONS_DIR", tmp_path / "sessions")
+    monkeypatch.delenv("SESSION_KEY", raising=False)
+    return tmp_path
+
+
+COOKIES = [{"name": "li_at", "value": "abc"}]
+
+
+def test_session_round_trip(store):
+    assert session_store.save_session("a@example.com", "http://x", "pw", COOKIES)
+    assert session_store.load_session("a@example.com", "http://x", "pw") == COOKIES
+    assert session_store.load_session("A@Example.com ", "http://x", "pw") == COOKIES
+    assert session_store.load_session("a@example.com", "http://other", "pw") == []
+    path = session_store.session_path("a@example.com", "http://x")
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert stat.S_IMODE(session_store.KEY_PATH.stat().st_mode) == 0o600
+    assert b"li_at" not in path.read_bytes()
+
+
+def test_session_needs_matching_password(store):
+    session_store.save_session("a@example.com", "http://x", "pw", COOKIES)
+    assert session_store.load_session("a@example.com", "http://x", "guess") == []
+    # The owner's session survives someone else's attempt
+    assert session_store.load_session("a@example.com", "http://x", "pw") == COOKIES
+
+
+def test_bad_session_key_fails_loudly_and_keeps_file(store, monkeypatch):
+    session_store.save_session("a@example.com", "http://x", "pw", COOKIES)
+    monkeypatch.setenv("SESSION_KEY", "not-a-fernet-key")
+    with pytest.raises(ValueError):
+        session_store.load_session("a@example.com", "http://x", "pw")
+    assert session_store.session_path("a@example.com", "http://x").exists()
+
+
+def test_session_under_other_key_is_discarded(store, monkeypatch):
+    session_store.save_session("a@example.com", "http://x", "pw", COOKIES)
+    monkeypatch.setenv("SESSION_KEY", Fernet.generate_key().decode())
+    assert session_store.load_session("a@example.com", "http://x", "pw") == []
+    assert not session_store.session_path("a@example.com", "http://x").exists()
+
+
+def _race_key(root: str, results):
+    session_store.KEY_PATH = Path(root) / ".session_key"
+    results.put(session_store._fernet().encrypt(b"probe"))
+
+
+def test_key_file_race_yields_one_key(store):
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_race_key, args=(str(store), results)) for _ in range(6)]
+    for p in procs:
+        p.start()
+    tokens = [results.get(timeout=60) for _ in procs]
+    for p in procs:
+        p.join()
+    # Every process encrypted with the key now on disk
+    fernet = session_store._fernet()
+    assert all(fernet.decrypt(t) == b"probe" for t in tokens)
+
+
+# ---------- memory governor ----------
+
+def make_governor(monkeypatch, rss_mb=100.0, restore_ok=True, **kw):
+    monkeypatch.setattr(memory_governor, "process_tree_rss", lambda pid: int(rss_mb * 2**20))
+    made, restored = [], []
+
+    def make_driver():
+        made.append(FakeDriver(pid=1))
+        return made[-1]
+
+    def restore(driver, cookies):
+        restored.append((driver, cookies))
+        return restore_ok
+
+    first = FakeDriver(pid=1)
+    gov = memory_governor.MemoryGovernor(first, make_driver, restore, log=lambda msg: None, **kw)
+    return gov, first, made, restored
+
+
+def test_governor_recycles_on_page_count(monkeypatch):
+    gov, first, made, restored = make_governor(monkeypatch, max_rss_mb=0, max_pages=2)
+    gov.after_page()
+    assert gov.driver is first and not made
+    gov.after_page()
+    assert first.quit_calls == 1
+    assert gov.driver is made[0] and gov.recycles == 1 and gov.pages == 0
+    assert restored == [(made[0], SHARD_COOKIES)]
+
+
+def test_governor_recycles_on_rss(monkeypatch):
+    gov, first, made, _ = make_governor(monkeypatch, rss_mb=2000, max_rss_mb=1500, max_pages=0)
+    gov.after_page()
+    assert gov.recycles == 1 and gov.driver is made[0]
+
+
+def test_governor_under_limits_keeps_driver(monkeypatch):
+    gov, first, made, _ = make_governor(monkeypatch, rss_mb=100, max_rss_mb=1500, max_pages=50)
+    for _ in range(10):
+        gov.after_page()
+    assert gov.driver is first and not made
+
+
+def test_governor_restore_failure_raises(monkeypatch):
+    gov, _, _, _ = make_governor(monkeypatch, restore_ok=False, max_rss_mb=0, max_pages=1)
+    with pytest.raises(RuntimeError):
+        gov.after_page()
@@ -1,13 +1,15 @@
 import json
+import os
 import random
 import time
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import requests
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
@@ -22,6 +24,20 @@ ua_pool = [
 ]
 
 
+# Network.setBlockedURLs wildcards skipped during profile navigation; extraction only needs the DOM
+BLOCKED_URL_PATTERNS = [
+    # images (the avatar is fetched separately by download_image)
+    "*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.svg*", "*.ico*", "*media.licdn.com/dms/image/*",
+    # fonts
+    "*.woff*", "*.ttf*", "*.otf*", "*.eot*",
+    # audio / video
+    "*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*",
+    # analytics and ads
+    "*google-analytics.com/*", "*googletagmanager.com/*", "*doubleclick.net/*",
+    "*px.ads.linkedin.com/*", "*/li/track*", "*/analytics/*",
+]
+
+
 def init_driver(headless: bool, proxy_url: Optional[str] = None):
     options = Options()
     if headless:
@@ -42,12 +58,104 @@ def init_driver(headless: bool, proxy_url: Optional[str] = None):
     return driver
 
 
-def human_scroll(driver, steps: int = 6, sleep_range: Tuple[float, float] = (0.5, 1.2)):
+class ScrapeFailure(Exception):
+    """A page failed fast; reason is a short classification (login-wall, no-main, load-timeout, ...)"""
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+
+
+class DeadlineExceeded(ScrapeFailure):
+    """A page or job ran out of its time budget"""
+
+
+class Deadline:
+    """Time budget every wait draws from; a child budget never outlives its parent"""
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional["Deadline"] = None, name: str = "url"):
+        self.name = name
+        self.parent = parent
+        self.expires_at = time.monotonic() + seconds if seconds and seconds > 0 else None
+
+    def child(self, seconds: Optional[float], name: str = "url") -> "Deadline":
+        return Deadline(seconds, parent=self, name=name)
+
+    def remaining(self) -> float:
+        left = float("inf")
+        d = self
+        while d:
+            if d.expires_at is not None:
+                left = min(left, d.expires_at - time.monotonic())
+            d = d.parent
+        return left
+
+    def timeout(self, cap: float) -> float:
+        # Wait length for one step: the step's own cap, clipped to what is left
+        return max(0.0, min(cap, self.remaining()))
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, stage: str):
+        d = self
+        while d:
+            if d.expires_at is not None and time.monotonic() >= d.expires_at:
+                raise DeadlineExceeded(f"{d.name}-deadline", f"budget spent before {stage}")
+            d = d.parent
+
+
+# Process-wide page-load pacer (anything with acquire(), e.g. batch.RateLimiter); None means unpaced
+_page_load_limiter = None
+
+
+def set_page_load_limiter(limiter):
+    global _page_load_limiter
+    _page_load_limiter = limiter
+
+
+def bounded_get(driver, url: str, deadline: Optional[Deadline] = None, cap: float = 45):
+    # driver.get whose page-load timeout comes out of the deadline instead of a fixed 45s;
+    # every page load (login, session probes, profiles) waits for the page-load limiter first
+    deadline = deadline or Deadline(cap)
+    if _page_load_limiter is not None:
+        _page_load_limiter.acquire()
+    deadline.check("page load")
+    driver.set_page_load_timeout(max(1, int(deadline.timeout(cap))))
+    try:
+        driver.get(url)
+    except TimeoutException:
+        raise DeadlineExceeded("load-timeout", url)
+
+
+def blocked_url_patterns() -> List[str]:
+    extra = [p.strip() for p in os.getenv("BLOCK_URL_PATTERNS", "").split(",") if p.strip()]
+    return BLOCKED_URL_PATTERNS + extra
+
+
+def set_resource_blocking(driver, enabled: bool):
+    # Toggle CDP URL blocking; no-op if the state is unchanged or the driver has no CDP
+    if getattr(driver, "_resource_blocking", None) == enabled:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_url_patterns() if enabled else []})
+        driver._resource_blocking = enabled
+    except Exception:
+        pass
+
+
+def human_scroll(driver, steps: int = 6, sleep_range: Tuple[float, float] = (0.5, 1.2), deadline: Optional[Deadline] = None):
     height = driver.execute_script("return document.body.scrollHeight") or 2000
     for i in range(1, steps + 1):
         y = int(height * (i / steps))
         driver.execute_script(f"window.scrollTo(0, {y});")
-        time.sleep(random.uniform(*sleep_range))
+        pause = random.uniform(*sleep_range)
+        if deadline:
+            # Stop scrolling rather than sleep past the budget
+            if deadline.remaining() <= pause:
+                break
+        time.sleep(pause)
 
 
 def wait_css(driver, selector: str, timeout: int = 8):
@@ -59,6 +167,21 @@ def wait_css(driver, selector: str, timeout: int = 8):
         return None
 
 
+def wait_any_css(driver, selectors: List[str], timeout: float = 8):
+    # Wait for whichever selector appears first; returns (selector, element) or (None, None)
+    def first_present(d):
+        for sel in selectors:
+            found = d.find_elements(By.CSS_SELECTOR, sel)
+            if found:
+                return sel, found[0]
+        return False
+
+    try:
+        return WebDriverWait(driver, timeout).until(first_present)
+    except Exception:
+        return None, None
+
+
 def text_or_empty(node) -> str:
     if not node:
         return ""
@@ -73,11 +196,11 @@ def json_dump_safe(obj) -> str:
         return "[]" if isinstance(obj, list) else "{}"
 
 
-def download_image(url: str, dst_path: Path) -> bool:
-    if not url:
+def download_image(url: str, dst_path: Path, timeout: float = 20) -> bool:
+    if not url or timeout <= 0:
         return False
     try:
-        resp = requests.get(url, timeout=20, stream=True)
+        resp = requests.get(url, timeout=timeout, stream=True)
         if resp.status_code != 200:
             return False
         dst_path.parent.mkdir(parents=True, exist_ok=True)
@@ -90,6 +213,21 @@ def download_image(url: str, dst_path: Path) -> bool:
         return False
 
 
-
-
-
+def process_tree_rss(pid: int) -> int:
+    # Total resident memory (bytes) of a process and all its descendants; 0 if unavailable
+    try:
+        import psutil
+    except ImportError:
+        return 0
+    try:
+        root = psutil.Process(pid)
+        procs = [root] + root.children(recursive=True)
+    except Exception:
+        return 0
+    total = 0
+    for p in procs:
+        try:
+            total += p.memory_info().rss
+        except Exception:
+            pass
+    return total
@@ -17,18 +17,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 # Import existing scraper modules
+import batch
 import linkedin_scraper
-from utils import init_driver, human_scroll, wait_css, text_or_empty, json_dump_safe, download_image
-from lk_selectors import SELECTORS
-from bs4 import BeautifulSoup
-from selenium.webdriver.common.by import By
+from memory_governor import MemoryGovernor
+from utils import Deadline, init_driver, set_page_load_limiter
 
 ROOT = Path(__file__).resolve().parent
-IMAGES_DIR = ROOT / "images"
+IMAGES_DIR = Path(os.getenv("IMAGES_DIR") or ROOT / "images")
 CSV_PATH = ROOT / "profiles.csv"
 
 app = FastAPI(title="LinkedIn Scraper Worker")
 
+_page_limiter: Optional[batch.RateLimiter] = None
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -44,6 +45,9 @@ class ScrapeRequest(BaseModel):
     password: str
     urls: List[str]
     webhook: str
+    # Batch mode: shards > 1 lifts the 20-URL cap and runs that many browsers
+    shards: int = 1
+    ratePerMin: float = 20.0
 
 
 async def send_webhook(webhook_url: str, payload: dict):
@@ -83,50 +87,150 @@ async def upload_image(backend_base: str, image_path: Path, name: str):
         print(f"[ERROR] Failed to upload image {name}: {e}")
 
 
-async def run_scrape_task(req: ScrapeRequest):
-    """Run the scraping task in background"""
-    job_id = req.jobId
-    webhook = req.webhook
-    
-    # Extract backend base URL
+def page_limiter() -> batch.RateLimiter:
+    """Worker-wide page-load limit (RATE_LIMIT_PER_MIN) shared by every job on this worker"""
+    global _page_limiter
+    if _page_limiter is None:
+        _page_limiter = batch.RateLimiter(float(os.getenv("RATE_LIMIT_PER_MIN", "20") or 20))
+        # In-process jobs pace through the hook, batch shards through shared_limiter
+        set_page_load_limiter(_page_limiter)
+    return _page_limiter
+
+
+def backend_base_from(webhook: str) -> str:
+    """Extract backend base URL from the webhook URL"""
     try:
         from urllib.parse import urlparse
         parsed = urlparse(webhook)
-        backend_base = f"{parsed.scheme}://{parsed.netloc}"
+        return f"{parsed.scheme}://{parsed.netloc}"
     except Exception:
         # Fallback: remove /api/scrape-webhook
-        backend_base = webhook.replace("/api/scrape-webhook", "")
+        return webhook.replace("/api/scrape-webhook", "")
+
+
+async def publish_results(req: ScrapeRequest, rows: List[Dict], backend_base: str):
+    """Save CSV, upload CSV and images, then send the done event"""
+    job_id = req.jobId
+    webhook = req.webhook
+
+    # Save CSV
+    linkedin_scraper.save_csv(rows, CSV_PATH)
+
+    await send_webhook(
+        webhook, {"jobId": job_id, "event": "log", "message": f"Saved CSV: {CSV_PATH}"}
+    )
+
+    # Upload CSV
+    await upload_csv(backend_base, CSV_PATH)
+
+    # Upload images (duplicate inputs share one image)
+    uploaded = set()
+    for row in rows:
+        if row.get("image_file"):
+            image_name = Path(row["image_file"]).name
+            image_path = IMAGES_DIR / image_name
+            if image_name not in uploaded and image_path.exists():
+                uploaded.add(image_name)
+                await upload_image(backend_base, image_path, image_name)
+
+    # Send done event
+    await send_webhook(
+        webhook,
+        {
+            "jobId": job_id,
+            "event": "done",
+            "total": len(rows),
+            "current": len(rows),
+            "message": "Scraping completed successfully",
+        },
+    )
+
+
+def plan_request_urls(req: ScrapeRequest):
+    """Canonicalize and dedupe the request URLs; returns (input_urls, unique_urls, mapping)"""
+    input_urls = [url.strip() for url in req.urls if url.strip()]
+    unique_urls, mapping = linkedin_scraper.plan_urls(input_urls)
+    return input_urls, unique_urls, mapping
+
+
+async def log_url_plan(req: ScrapeRequest, input_urls: List[str], unique_urls: List[str], mapping: List[Optional[int]]):
+    """Tell the backend about skipped non-profile URLs and collapsed duplicates"""
+    skipped = [url for url, pos in zip(input_urls, mapping) if pos is None]
+    duplicates = len(input_urls) - len(skipped) - len(unique_urls)
+    if skipped or duplicates:
+        await send_webhook(
+            req.webhook,
+            {
+                "jobId": req.jobId,
+                "event": "log",
+                "message": f"{len(input_urls)} URLs -> {len(unique_urls)} unique profiles "
+                f"({duplicates} duplicates, {len(skipped)} not profile URLs)",
+            },
+        )
+    for url in skipped:
+        await send_webhook(req.webhook, {"jobId": req.jobId, "event": "log", "message": f"Skipping non-profile URL: {url}"})
+
+
+async def run_scrape_task(req: ScrapeRequest):
+    """Run the scraping task in background"""
+    job_id = req.jobId
+    webhook = req.webhook
+    backend_base = backend_base_from(webhook)
 
-    driver = None
+    governor = None
+    page_limiter()
     try:
+        input_urls, valid_urls, mapping = plan_request_urls(req)
+        valid_urls = valid_urls[:20]  # Max 20
+        await log_url_plan(req, input_urls, valid_urls, mapping)
+        job = Deadline(float(os.getenv("JOB_DEADLINE_S", "0") or 0), name="job")
+
         # Initialize browser
         await send_webhook(webhook, {"jobId": job_id, "event": "browser-started", "message": "Browser starting..."})
         
         headless = os.getenv("HEADLESS", "true").lower() == "true"
         proxy_url = os.getenv("PROXY_URL", "").strip() or None
         driver = init_driver(headless=headless, proxy_url=proxy_url)
+        governor = MemoryGovernor(
+            driver,
+            make_driver=lambda: init_driver(headless=headless, proxy_url=proxy_url),
+            restore_session=lambda d, cookies: linkedin_scraper.restore_session(
+                d, cookies, req.email, req.password, job
+            ),
+        )
 
         # Login
         await send_webhook(webhook, {"jobId": job_id, "event": "log", "message": "Attempting login..."})
         
-        if not linkedin_scraper.login(driver, req.email, req.password):
+        if not linkedin_scraper.ensure_login(driver, req.email, req.password, job):
             await send_webhook(
                 webhook,
                 {
                     "jobId": job_id,
                     "event": "login-error",
-                    "error": "Login failed. Check credentials or try again.",
+                    "error": "Job deadline spent during login." if job.expired()
+                    else "Login failed. Check credentials or try again.",
                 },
             )
             return
 
         await send_webhook(webhook, {"jobId": job_id, "event": "login-success", "message": "Login successful"})
 
-        # Scrape URLs
+        # Scrape URLs; every wait draws from the per-URL budget, which draws from the job budget
         rows = []
-        valid_urls = [url.strip() for url in req.urls if url.strip()][:20]  # Max 20
 
         for idx, url in enumerate(valid_urls, start=1):
+            if job.expired():
+                # Everything left would fail instantly; the rest stay empty rows
+                await send_webhook(
+                    webhook,
+                    {
+                        "jobId": job_id,
+                        "event": "log",
+                        "message": f"Job deadline reached [job-deadline]: {len(valid_urls) - idx + 1} profiles not scraped",
+                    },
+                )
+                break
             try:
                 await send_webhook(
                     webhook,
@@ -139,77 +243,11 @@ async def run_scrape_task(req: ScrapeRequest):
                     },
                 )
 
-                driver.get(url)
-                wait_css(driver, "main", timeout=15)
-                human_scroll(driver, steps=random.randint(6, 9))
-
-                # Try to expand "See more" sections
-                try:
-                    buttons = driver.find_elements(
-                        By.XPATH,
-                        "//button[.//span[contains(translate(text(),'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'see more')] or contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'see more')]",
-                    )
-                    for b in buttons[:5]:
-                        try:
-                            driver.execute_script("arguments[0].click();", b)
-                            time.sleep(0.3)
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
-
-                html = driver.page_source
-                soup = BeautifulSoup(html, "html.parser")
-
-                name = linkedin_scraper.first_text(soup, SELECTORS["name"]) or ""
-                headline = linkedin_scraper.first_text(soup, SELECTORS["headline"]) or ""
-                location = linkedin_scraper.first_text(soup, SELECTORS["location"]) or ""
-                about = linkedin_scraper.first_text(soup, SELECTORS["about"]) or ""
-                image_url = linkedin_scraper.first_attr(soup, SELECTORS["image"], "src")
-
-                # Fallbacks
-                if not name:
-                    title_node = soup.select_one("title")
-                    if title_node:
-                        t = (title_node.get_text() or "").strip()
-                        if t:
-                            name = t.split(" - ")[0].split("|")[0].strip()
-                if not name:
-                    og_title = linkedin_scraper.meta_content(soup, "og:title")
-                    if og_title:
-                        name = og_title.split(" - ")[0].split("|")[0].strip()
-
-                if not image_url:
-                    image_url = linkedin_scraper.meta_content(soup, "og:image")
-
-                experiences = linkedin_scraper.parse_experiences(soup)
-                education = linkedin_scraper.parse_education(soup)
-                projects = linkedin_scraper.parse_projects(soup)
-                skills = linkedin_scraper.parse_skills(soup)
-
-                image_file = ""
-                image_name = f"profile_{idx}.jpg"
-                if image_url:
-                    image_path = IMAGES_DIR / image_name
-                    IMAGES_DIR.mkdir(parents=True, exist_ok=True)
-                    if download_image(image_url, image_path):
-                        image_file = f"images/{image_name}"
-
-                row = {
-                    "url": url,
-                    "name": name,
-                    "headline": headline,
-                    "location": location,
-                    "about": about,
-                    "image_file": image_file,
-                    "experiences_json": json_dump_safe(experiences),
-                    "education_json": json_dump_safe(education),
-                    "projects_json": json_dump_safe(projects),
-                    "skills_csv": ", ".join(skills[:50]),
-                }
-
+                row = linkedin_scraper.scrape_profile(
+                    governor.driver, url, idx, deadline=job.child(linkedin_scraper.profile_deadline_s())
+                )
                 rows.append(row)
-                printable_name = name or url
+                printable_name = row["name"] or url
                 await send_webhook(
                     webhook,
                     {
@@ -219,8 +257,8 @@ async def run_scrape_task(req: ScrapeRequest):
                     },
                 )
 
-                # Random delay between requests
-                time.sleep(random.uniform(2, 4))
+                # Random delay between requests, never past the job deadline
+                time.sleep(job.timeout(random.uniform(2, 4)))
 
             except Exception as e:
                 error_msg = str(e).replace(req.password, "***")  # Never log password
@@ -229,70 +267,110 @@ async def run_scrape_task(req: ScrapeRequest):
                     {
                         "jobId": job_id,
                         "event": "log",
-                        "message": f"Failed to scrape {url}: {error_msg}",
+                        "message": f"Failed to scrape {url} [{getattr(e, 'reason', 'error')}]: {error_msg}",
                     },
                 )
                 # Still append empty row
-                rows.append(
+                rows.append(linkedin_scraper.empty_row(url))
+
+            if job.expired():
+                # No recycle for pages that will never load; the next iteration stops the job
+                continue
+            recycles = governor.recycles
+            try:
+                governor.after_page()
+            except Exception as e:
+                # No usable browser left; publish what was scraped, the rest become empty rows
+                error_msg = str(e).replace(req.password, "***")
+                await send_webhook(
+                    webhook,
                     {
-                        "url": url,
-                        "name": "",
-                        "headline": "",
-                        "location": "",
-                        "about": "",
-                        "image_file": "",
-                        "experiences_json": "[]",
-                        "education_json": "[]",
-                        "projects_json": "[]",
-                        "skills_csv": "",
-                    }
+                        "jobId": job_id,
+                        "event": "log",
+                        "message": f"Stopping after {idx}/{len(valid_urls)} profiles, browser recycle failed: {error_msg}",
+                    },
+                )
+                break
+            if governor.recycles != recycles:
+                await send_webhook(
+                    webhook,
+                    {"jobId": job_id, "event": "log", "message": f"Browser recycled to cap memory ({governor.recycles} so far)"},
                 )
 
-        # Save CSV
-        import pandas as pd
-
-        headers = [
-            "url",
-            "name",
-            "headline",
-            "location",
-            "about",
-            "image_file",
-            "experiences_json",
-            "education_json",
-            "projects_json",
-            "skills_csv",
-        ]
-        df = pd.DataFrame(rows, columns=headers)
-        CSV_PATH.parent.mkdir(parents=True, exist_ok=True)
-        df.to_csv(CSV_PATH, index=False, encoding="utf-8")
+        await publish_results(req, linkedin_scraper.expand_rows(input_urls, rows, mapping), backend_base)
 
+    except Exception as e:
+        error_msg = str(e).replace(req.password, "***")  # Never log password
         await send_webhook(
-            webhook, {"jobId": job_id, "event": "log", "message": f"Saved CSV: {CSV_PATH}"}
+            webhook,
+            {
+                "jobId": job_id,
+                "event": "error",
+                "error": error_msg,
+                "message": f"Scraping failed: {error_msg}",
+            },
         )
+    finally:
+        if governor:
+            governor.quit()
 
-        # Upload CSV
-        await upload_csv(backend_base, CSV_PATH)
 
-        # Upload images
-        for idx, row in enumerate(rows, start=1):
-            if row.get("image_file"):
-                image_name = f"profile_{idx}.jpg"
-                image_path = IMAGES_DIR / image_name
-                if image_path.exists():
-                    await upload_image(backend_base, image_path, image_name)
+async def run_batch_task(req: ScrapeRequest):
+    """Run a sharded batch job: several browsers, one global rate limit"""
+    job_id = req.jobId
+    webhook = req.webhook
+    backend_base = backend_base_from(webhook)
+    loop = asyncio.get_running_loop()
+
+    input_urls, valid_urls, mapping = plan_request_urls(req)
+    total = len(valid_urls)
+    settled = 0
+
+    def on_result(idx: int, row: Optional[Dict], error: str):
+        # Called from the batch thread; hop back onto the event loop for webhooks
+        nonlocal settled
+        settled += 1
+        if row is not None:
+            message = f"Extracted [{idx}/{total}]: {row['name'] or row['url']}"
+        else:
+            message = f"Failed to scrape {valid_urls[idx - 1]}: {error.replace(req.password, '***')}"
+        payload = {"jobId": job_id, "event": "scraping", "current": settled, "total": total, "message": message}
+        asyncio.run_coroutine_threadsafe(send_webhook(webhook, payload), loop)
 
-        # Send done event
+    try:
+        await log_url_plan(req, input_urls, valid_urls, mapping)
         await send_webhook(
             webhook,
-            {
-                "jobId": job_id,
-                "event": "done",
-                "total": len(valid_urls),
-                "current": len(valid_urls),
-                "message": "Scraping completed successfully",
-            },
+            {"jobId": job_id, "event": "browser-started", "message": f"Starting {req.shards} browsers for {total} URLs..."},
+        )
+        headless = os.getenv("HEADLESS", "true").lower() == "true"
+        proxy_url = os.getenv("PROXY_URL", "").strip() or None
+        rows = await asyncio.to_thread(
+            batch.run_batch,
+            valid_urls,
+            req.email,
+            req.password,
+            shards=req.shards,
+            rate_per_min=req.ratePerMin,
+            job_deadline_s=float(os.getenv("JOB_DEADLINE_S", "0") or 0),
+            retries=int(os.getenv("SHARD_RETRIES", "2") or 2),
+            headless=headless,
+            proxy_url=proxy_url,
+            on_result=on_result,
+            shared_limiter=page_limiter(),
         )
+        if rows is None:
+            await send_webhook(
+                webhook,
+                {
+                    "jobId": job_id,
+                    "event": "login-error",
+                    "error": "Login failed. Check credentials or try again.",
+                },
+            )
+            return
+
+        await publish_results(req, linkedin_scraper.expand_rows(input_urls, rows, mapping), backend_base)
 
     except Exception as e:
         error_msg = str(e).replace(req.password, "***")  # Never log password
@@ -305,12 +383,6 @@ async def run_scrape_task(req: ScrapeRequest):
                 "message": f"Scraping failed: {error_msg}",
             },
         )
-    finally:
-        if driver:
-            try:
-                driver.quit()
-            except Exception:
-                pass
 
 
 @app.post("/start")
@@ -319,13 +391,25 @@ async def start_scrape(req: ScrapeRequest):
     # Validate
     if not req.email or not req.password:
         raise HTTPException(status_code=400, detail="Email and password required")
-    if not req.urls or len(req.urls) > 20:
-        raise HTTPException(status_code=400, detail="URLs array must contain 1-20 URLs")
+    if not req.urls:
+        raise HTTPException(status_code=400, detail="URLs array must not be empty")
+    _, unique_urls, _ = plan_request_urls(req)
+    if not unique_urls:
+        raise HTTPException(status_code=400, detail="No linkedin.com/in/ profile URLs found")
+    if req.ratePerMin <= 0:
+        raise HTTPException(status_code=400, detail="ratePerMin must be positive")
+    # Each shard is a Chrome process; never start more than MAX_SHARDS per job
+    req.shards = max(1, min(req.shards, int(os.getenv("MAX_SHARDS", "4") or 4)))
+    if req.shards <= 1 and len(unique_urls) > 20:
+        raise HTTPException(status_code=400, detail="URLs array must contain 1-20 profiles (set shards > 1 for batch mode)")
     if not req.webhook:
         raise HTTPException(status_code=400, detail="Webhook URL required")
 
     # Start background task
-    asyncio.create_task(run_scrape_task(req))
+    if req.shards > 1:
+        asyncio.create_task(run_batch_task(req))
+    else:
+        asyncio.create_task(run_scrape_task(req))
 
     return {"ok": True, "message": "Scrape job started", "jobId": req.jobId}
 